@@ -1,4 +1,9 @@
-import copy
+import sys
+import math
+import collections
+import time
+import random
+import json
 import numpy as np
 import argparse
 # State representation of matrices
@@ -14,6 +19,81 @@ import argparse
 # command line argument parsing
 parser = argparse.ArgumentParser()
 parser.add_argument('Arguments', metavar='N', type=int, nargs='+')
+parser.add_argument('--movegen', choices=['table', 'unrolled', 'bitboard', 'mailbox'],
+                    default='table',
+                    help='move generator: precomputed move tables, the hand-unrolled move_* '
+                         'functions, bitboards or a 10x12 mailbox board')
+parser.add_argument('--benchmark', action='store_true',
+                    help='search all three puzzles and report states per second')
+parser.add_argument('--tt-size', type=float, default=0, metavar='MB',
+                    help='transposition table size in megabytes (0 disables it)')
+parser.add_argument('--time-limit', type=float, metavar='SECONDS',
+                    help='search with iterative deepening until this much time has passed')
+parser.add_argument('--node-limit', type=int, metavar='STATES',
+                    help='search with iterative deepening until this many states are visited')
+parser.add_argument('--algorithm', choices=['alphabeta', 'pvs', 'mtdf'], default='alphabeta',
+                    help='plain alpha-beta, principal variation search or MTD(f)')
+parser.add_argument('--compare-mtdf', action='store_true',
+                    help='search all three puzzles with alpha-beta and with MTD(f) and '
+                         'report states visited and time for each')
+parser.add_argument('--null-move', choices=['off', 'on', 'verified'], default='off',
+                    help='null-move pruning, optionally verified by a reduced search')
+parser.add_argument('--compare-null-move', action='store_true',
+                    help='search all three puzzles without null moves, with them and with '
+                         'verified null moves and report states visited and time for each '
+                         '(null moves need --depth 5 or more)')
+parser.add_argument('--lmr', action='store_true',
+                    help='reduce the search depth of late quiet moves (needs --depth 4 '
+                         'or more)')
+parser.add_argument('--lmr-table', type=float, nargs=2, metavar=('BASE', 'DIVISOR'),
+                    help='reduction for plies left d and move number n is '
+                         'int(BASE + log(d) * log(n) / DIVISOR) (default 0.75 2.25)')
+parser.add_argument('--futility', action='store_true',
+                    help='skip quiet moves one ply above the depth limit that cannot reach alpha')
+parser.add_argument('--futility-margin', type=float, default=3, metavar='MATERIAL',
+                    help='futility pruning margin (default 3)')
+parser.add_argument('--razoring', action='store_true',
+                    help='fail low two plies above the depth limit when even captures '
+                         'cannot reach alpha')
+parser.add_argument('--razor-margin', type=float, default=5, metavar='MATERIAL',
+                    help='razoring margin (default 5)')
+parser.add_argument('--aspiration', action='store_true',
+                    help='search each deepening iteration with a window around the last value')
+parser.add_argument('--aspiration-window', type=float, default=1, metavar='MATERIAL',
+                    help='initial aspiration window either side of the last value (default 1)')
+parser.add_argument('--pst', choices=['off', 'plain', 'tapered'], default='off',
+                    help='add piece-square table bonuses to the evaluation, optionally '
+                         'tapered between middlegame and endgame tables')
+parser.add_argument('--pst-file', metavar='FILE',
+                    help='JSON file of piece-square tables to use instead of the defaults')
+parser.add_argument('--batch-eval', action='store_true',
+                    help='evaluate all children of nodes one ply above the depth limit '
+                         'in one NumPy call (an experiment: slower than the incremental '
+                         'evaluation the search uses otherwise)')
+parser.add_argument('--benchmark-eval', action='store_true',
+                    help='time evaluate() against evaluate_batch() for growing batch sizes')
+parser.add_argument('--check-eval', action='store_true',
+                    help='search all three puzzles with every heuristic, checking the '
+                         'incremental evaluation against evaluate() at every node')
+parser.add_argument('--lazy-movegen', action='store_true',
+                    help='generate moves one piece at a time as the search takes them, '
+                         'captures first, ordering each piece\'s moves by the heuristic '
+                         'instead of sorting a full list')
+parser.add_argument('--compare-lazy', action='store_true',
+                    help='search all three puzzles with full move lists and with lazy '
+                         'generation and report the moves generated but never searched')
+parser.add_argument('--quiescence', action='store_true',
+                    help='extend captures past the depth limit with a quiescence search')
+parser.add_argument('--compare-movegen', action='store_true',
+                    help='check that every move generator gives the same moves as the move_* '
+                         'functions in all positions within three plies of each puzzle, '
+                         'and time each')
+parser.add_argument('--compare-killers', action='store_true',
+                    help='search all three puzzles with heuristic 3 with and without killer '
+                         'moves and history, and report the change in states visited')
+parser.add_argument('--depth', type=int, metavar='PLIES',
+                    help='search this many plies (default 3); with --time-limit or '
+                         '--node-limit, deepen at most this far')
 arguments = parser.parse_args()
 
 # error messages
@@ -21,8 +101,10 @@ if(len(arguments.Arguments) != 2):
     sys.exit("    Error: Incorrect number of command line arguments supplied; 2 needed")
 if(arguments.Arguments[0] < 1 or arguments.Arguments[0] > 3):
     sys.exit("    Error: Invalid value for first command line argument; must be in range(1,3)")
-if(arguments.Arguments[1] < 1 or arguments.Arguments[1] > 2):
-    sys.exit("    Error: Invalid value for second command line argument; must be in range(1,2)")
+if(arguments.Arguments[1] < 1 or arguments.Arguments[1] > 3):
+    sys.exit("    Error: Invalid value for second command line argument; must be in range(1,3)")
+if(arguments.depth is not None and (arguments.depth < 1 or arguments.depth > 39)):
+    sys.exit("    Error: Invalid value for --depth; must be in range(1,39)")
 
 used_state = arguments.Arguments[0]             # which given puzzle to solve
 used_search = arguments.Arguments[1]          # which heuristic strategy to use
@@ -91,38 +173,285 @@ piece_values = {
 
 # Max depth
 MAX_DEPTH = 4
+used_depth = MAX_DEPTH if arguments.depth is None else arguments.depth + 1    # root is depth 1
+
+################################################################################
+#  Board representation
+# ------------------------------------------------------------------------------
+#  64 squares packed into an immutable bytes object, row-major from the top
+#  left (index = row * 8 + col), one ASCII piece character per square.
+#  Copying a board is a single 64-byte allocation instead of a deepcopy of
+#  nine lists, and boards can be hashed and compared directly.
+BOARD_SIZE = 8
+EMPTY = ord('_')
+
+WHITE_PIECES = frozenset(b'PNRBQK')
+BLACK_PIECES = frozenset(b'pnrbqk')
+WHITE_PIECES_OR_EMPTY = WHITE_PIECES | {EMPTY}
+BLACK_PIECES_OR_EMPTY = BLACK_PIECES | {EMPTY}
+
+# Owner of each piece byte, None for EMPTY
+PIECE_SIDES = [None] * 128
+for piece in WHITE_PIECES:
+    PIECE_SIDES[piece] = "WHITE"
+for piece in BLACK_PIECES:
+    PIECE_SIDES[piece] = "BLACK"
+
+# piece_values indexed by the byte stored on a square
+byte_values = [0] * 128
+for piece, value in piece_values.items():
+    byte_values[ord(piece)] = value
+
+class Board:
+    __slots__ = ('squares',)
+
+    def __init__(self, squares):
+        self.squares = bytes(squares)
+
+    @classmethod
+    def from_rows(cls, rows):
+        return cls(''.join(''.join(row) for row in rows).encode('ascii'))
+
+    def to_rows(self):
+        text = self.squares.decode('ascii')
+        return [list(text[row * 8:row * 8 + 8]) for row in range(BOARD_SIZE)]
+
+    # Returns a new board with piece (a byte) placed on to_index and
+    # from_index emptied
+    def move(self, from_index, to_index, piece):
+        squares = bytearray(self.squares)
+        squares[to_index] = piece
+        squares[from_index] = EMPTY
+        return Board(squares)
+
+    def __eq__(self, other):
+        return isinstance(other, Board) and self.squares == other.squares
+
+    def __hash__(self):
+        return hash(self.squares)
+
+    def __repr__(self):
+        return 'Board(%r)' % self.squares
+
+################################################################################
+#  Moves and make/unmake
+# ------------------------------------------------------------------------------
+#  A move is packed into one int: to_index in bits 0-5, from_index in bits
+#  6-11, the piece moved in bits 12-18, the piece captured on to_index (EMPTY
+#  if none) in bits 19-25 and the distance moved (used by sortFirst) in bits
+#  26-28, where a full chess program would keep its promotion and castling
+#  flags. The low 12 bits are from_index * 64 + to_index, which is all the
+#  hash move, killers and history need to tell moves apart. Move lists, the
+#  killer and history tables and the transposition table hold these ints;
+#  Move is a view of one with named fields for code outside the search. The
+#  search applies moves to one mutable Position and takes them back again
+#  instead of building a board for every child.
+FROM_SHIFT = 6
+PIECE_SHIFT = 12
+CAPTURED_SHIFT = 19
+DISTANCE_SHIFT = 26
+SQUARE_MASK = 63
+PIECE_MASK = 127
+FROM_TO_MASK = 4095
+
+def encode_move(from_index, to_index, piece, captured, distance):
+    return (to_index | from_index << FROM_SHIFT | piece << PIECE_SHIFT |
+            captured << CAPTURED_SHIFT | distance << DISTANCE_SHIFT)
+
+class Move:
+    __slots__ = ('code',)
+
+    def __init__(self, code):
+        self.code = code
+
+    @property
+    def from_index(self):
+        return self.code >> FROM_SHIFT & SQUARE_MASK
+
+    @property
+    def to_index(self):
+        return self.code & SQUARE_MASK
+
+    @property
+    def piece(self):
+        return self.code >> PIECE_SHIFT & PIECE_MASK
+
+    @property
+    def captured(self):
+        return self.code >> CAPTURED_SHIFT & PIECE_MASK
+
+    @property
+    def distance(self):
+        return self.code >> DISTANCE_SHIFT
+
+    @property
+    def value(self):
+        return byte_values[self.captured]    # value of the piece taken
+
+    def __eq__(self, other):
+        return isinstance(other, Move) and self.code == other.code
+
+    def __hash__(self):
+        return hash(self.code)
+
+    def __repr__(self):
+        return 'Move(%s%d%d-%d%d)' % (chr(self.piece),
+                                      *divmod(self.from_index, BOARD_SIZE),
+                                      *divmod(self.to_index, BOARD_SIZE))
+
+################################################################################
+#  Zobrist hashing
+# ------------------------------------------------------------------------------
+#  One random 64-bit number per (piece, square) plus one for Black to move;
+#  a position's key is the XOR of the numbers for everything on the board.
+#  The generator is seeded so keys are stable across runs and processes.
+zobrist_random = random.Random(2019)
+ZOBRIST_PIECES = [[0] * 64 for piece in range(128)]    # indexed by piece byte
+for piece in WHITE_PIECES | BLACK_PIECES:
+    ZOBRIST_PIECES[piece] = [zobrist_random.getrandbits(64) for index in range(64)]
+ZOBRIST_BLACK_TO_MOVE = zobrist_random.getrandbits(64)
+
+def zobrist_key(state, player):
+    key = ZOBRIST_BLACK_TO_MOVE if player == "BLACK" else 0
+    for index, piece in enumerate(state.squares):
+        key ^= ZOBRIST_PIECES[piece][index]
+    return key
+
+class Position:
+    def __init__(self, board, player="WHITE"):
+        self.squares = bytearray(board.squares)
+        self.key = zobrist_key(board, player)    # player is the side to move
+        self.material = sum(MATERIAL_VALUES[piece] for piece in self.squares)
+        self.pst_middlegame, self.pst_endgame, self.phase = piece_square_sums(self.squares)
+        self.undo_stack = []    # (move, piece that stood on from_index, key)
+        # Each side's pieces as a mask of the squares they stand on, so move
+        # generation visits them in square order without scanning the board,
+        # and each side's king square (-1 once captured)
+        self.pieces = {"WHITE": 0, "BLACK": 0}
+        self.king_squares = {"WHITE": -1, "BLACK": -1}
+        for index, piece in enumerate(self.squares):
+            side = PIECE_SIDES[piece]
+            if side is not None:
+                self.pieces[side] |= 1 << index
+                if piece == KINGS[side]:
+                    self.king_squares[side] = index
+
+    # The key is updated for the piece leaving from_index, the captured piece
+    # leaving to_index, the piece arriving there and the change of side; the
+    # material for the captured piece and any promotion, and the piece-square
+    # sums (when in use) for all three pieces
+    def make_move(self, move):
+        squares = self.squares
+        from_index = move >> FROM_SHIFT & SQUARE_MASK
+        to_index = move & SQUARE_MASK
+        piece = move >> PIECE_SHIFT & PIECE_MASK
+        captured = move >> CAPTURED_SHIFT & PIECE_MASK
+        moved = squares[from_index]
+        self.undo_stack.append((move, moved, self.key))
+        side = PIECE_SIDES[moved]
+        self.pieces[side] ^= (1 << from_index) | (1 << to_index)
+        if moved == KINGS[side]:
+            self.king_squares[side] = to_index
+        if captured != EMPTY:
+            self.remove_captured(captured, to_index, -1)
+        self.key ^= (ZOBRIST_PIECES[moved][from_index] ^
+                     ZOBRIST_PIECES[captured][to_index] ^
+                     ZOBRIST_PIECES[piece][to_index] ^
+                     ZOBRIST_BLACK_TO_MOVE)
+        self.material += (MATERIAL_VALUES[piece] - MATERIAL_VALUES[moved] -
+                          MATERIAL_VALUES[captured])
+        if use_pst:
+            self.update_piece_squares(move, moved, 1)
+        squares[to_index] = piece
+        squares[from_index] = EMPTY
+
+    def unmake_move(self):
+        move, moved, self.key = self.undo_stack.pop()
+        from_index = move >> FROM_SHIFT & SQUARE_MASK
+        to_index = move & SQUARE_MASK
+        piece = move >> PIECE_SHIFT & PIECE_MASK
+        captured = move >> CAPTURED_SHIFT & PIECE_MASK
+        side = PIECE_SIDES[moved]
+        self.pieces[side] ^= (1 << from_index) | (1 << to_index)
+        if moved == KINGS[side]:
+            self.king_squares[side] = from_index
+        if captured != EMPTY:
+            self.remove_captured(captured, to_index, to_index)
+        self.material -= (MATERIAL_VALUES[piece] - MATERIAL_VALUES[moved] -
+                          MATERIAL_VALUES[captured])
+        if use_pst:
+            self.update_piece_squares(move, moved, -1)
+        squares = self.squares
+        squares[from_index] = moved
+        squares[to_index] = captured
+
+    # Flips the captured piece on to_index in its side's mask (taking it off
+    # the board or putting it back) and puts a captured king on king_square
+    def remove_captured(self, captured, to_index, king_square):
+        side = PIECE_SIDES[captured]
+        self.pieces[side] ^= 1 << to_index
+        if captured == KINGS[side]:
+            self.king_squares[side] = king_square
+
+    # Adds (sign 1) or takes back (sign -1) move's change to the piece-square sums
+    def update_piece_squares(self, move, moved, sign):
+        from_index, to_index = move >> FROM_SHIFT & SQUARE_MASK, move & SQUARE_MASK
+        piece, captured = move >> PIECE_SHIFT & PIECE_MASK, move >> CAPTURED_SHIFT & PIECE_MASK
+        self.pst_middlegame += sign * (pst_middlegame[piece][to_index] -
+                                       pst_middlegame[moved][from_index] -
+                                       pst_middlegame[captured][to_index])
+        self.pst_endgame += sign * (pst_endgame[piece][to_index] -
+                                    pst_endgame[moved][from_index] -
+                                    pst_endgame[captured][to_index])
+        self.phase += sign * (PHASE_WEIGHTS[piece] - PHASE_WEIGHTS[moved] -
+                              PHASE_WEIGHTS[captured])
+
+    # Passes the turn without moving (null-move pruning)
+    def make_null_move(self):
+        self.undo_stack.append((None, EMPTY, self.key))
+        self.key ^= ZOBRIST_BLACK_TO_MOVE
+
+    def unmake_null_move(self):
+        move, moved, self.key = self.undo_stack.pop()
+
+    def is_attacked(self, index, by_player):
+        return square_attacked(self.squares, index, by_player)
+
+    def board(self):
+        return Board(self.squares)
+
+    def generate_moves(self, player):
+        return generate_moves(self, player)
+
+    def generate_captures(self, player):
+        return generate_moves(self, player, True)
+
+    def generate_quiets(self, player):
+        return generate_moves(self, player, quiets_only=True)
+
+    # Captures (or quiet moves) of the piece on index, for iterate_moves
+    def piece_moves(self, index, player, captures):
+        moves = []
+        add_table_moves(moves, self.squares, index, ENEMY_PIECES[player], captures, not captures)
+        return moves
 
 ################################################################################
 #  Evaluation function
 # ------------------------------------------------------------------------------
 #  Linear weighted sum of features
 def evaluate(state):
-    # Piece counts
-    white_queen  = 0
-    black_queen  = 0
-    white_rook   = 0
-    black_rook   = 0
-    white_bishop = 0
-    black_bishop = 0
-    white_knight = 0
-    black_knight = 0
-    white_pawn   = 0
-    black_pawn   = 0
-
-    # Traverse over board and count number of each piece
-    for row in range(len(state)):
-        for col in range(len(state[0])):
-            piece = state[row][col]
-            if piece   == 'Q': white_queen  += 1
-            elif piece == 'q': black_queen  += 1
-            elif piece == "R": white_rook   += 1
-            elif piece == "r": black_rook   += 1
-            elif piece == "B": white_bishop += 1
-            elif piece == "b": black_bishop += 1
-            elif piece == "N": white_knight += 1
-            elif piece == "n": black_knight += 1
-            elif piece == "P": white_pawn   += 1
-            elif piece == "p": black_pawn   += 1
+    # Piece counts (bytes.count scans the packed board in C)
+    squares = state.squares
+    white_queen  = squares.count(b'Q')
+    black_queen  = squares.count(b'q')
+    white_rook   = squares.count(b'R')
+    black_rook   = squares.count(b'r')
+    white_bishop = squares.count(b'B')
+    black_bishop = squares.count(b'b')
+    white_knight = squares.count(b'N')
+    black_knight = squares.count(b'n')
+    white_pawn   = squares.count(b'P')
+    black_pawn   = squares.count(b'p')
 
     weighted_sum = (QUEEN  * (white_queen-black_queen)   +
                     ROOK   * (white_rook-black_rook)     +
@@ -130,356 +459,458 @@ def evaluate(state):
                     KNIGHT * (white_knight-black_knight) +
                     PAWN   * (white_pawn-black_pawn))
 
+    if use_pst:
+        weighted_sum += piece_square_score(*piece_square_sums(squares))
     return weighted_sum
 
+# Each piece's contribution to evaluate(), indexed by piece byte, so a
+# Position can keep its material up to date as moves are made
+MATERIAL_VALUES = [0] * 128
+for piece, value in (('Q', QUEEN), ('R', ROOK), ('B', BISHOP), ('N', KNIGHT), ('P', PAWN)):
+    MATERIAL_VALUES[ord(piece)] = value
+    MATERIAL_VALUES[ord(piece.lower())] = -value
 
 ################################################################################
-#  Cutoff test function - has terminal test inside it
+#  Piece-square tables
 # ------------------------------------------------------------------------------
-#
-def cutoff_test(state, depth, player):
-    is_max_depth = False
-    is_checkmate = False
-
-    if depth == MAX_DEPTH: # assuming that depth starts at 1
-        is_max_depth = True
-    if test_checkmate(state, player):
-        is_checkmate = True
-
-    return (is_max_depth, is_checkmate)
-
-def sortSecond(val):
-    return val[2]
+#  With --pst, evaluate() adds a bonus in centipawns for each piece by the
+#  square it stands on. The tables are written from White's side, top row
+#  first as on the board, and mirrored for Black. Tapered evaluation blends
+#  middlegame and endgame tables by the game phase, which counts down from
+#  MAX_PHASE as knights, bishops, rooks and queens come off the board.
+#  Defaults are Tomasz Michniewski's simplified evaluation function tables;
+#  --pst-file loads others (see load_piece_square_tables).
+use_pst = False
+use_tapered_eval = False
+
+PST_MIDDLEGAME = {
+    'P': (  0,   0,   0,   0,   0,   0,   0,   0,
+           50,  50,  50,  50,  50,  50,  50,  50,
+           10,  10,  20,  30,  30,  20,  10,  10,
+            5,   5,  10,  25,  25,  10,   5,   5,
+            0,   0,   0,  20,  20,   0,   0,   0,
+            5,  -5, -10,   0,   0, -10,  -5,   5,
+            5,  10,  10, -20, -20,  10,  10,   5,
+            0,   0,   0,   0,   0,   0,   0,   0),
+    'N': (-50, -40, -30, -30, -30, -30, -40, -50,
+          -40, -20,   0,   0,   0,   0, -20, -40,
+          -30,   0,  10,  15,  15,  10,   0, -30,
+          -30,   5,  15,  20,  20,  15,   5, -30,
+          -30,   0,  15,  20,  20,  15,   0, -30,
+          -30,   5,  10,  15,  15,  10,   5, -30,
+          -40, -20,   0,   5,   5,   0, -20, -40,
+          -50, -40, -30, -30, -30, -30, -40, -50),
+    'B': (-20, -10, -10, -10, -10, -10, -10, -20,
+          -10,   0,   0,   0,   0,   0,   0, -10,
+          -10,   0,   5,  10,  10,   5,   0, -10,
+          -10,   5,   5,  10,  10,   5,   5, -10,
+          -10,   0,  10,  10,  10,  10,   0, -10,
+          -10,  10,  10,  10,  10,  10,  10, -10,
+          -10,   5,   0,   0,   0,   0,   5, -10,
+          -20, -10, -10, -10, -10, -10, -10, -20),
+    'R': (  0,   0,   0,   0,   0,   0,   0,   0,
+            5,  10,  10,  10,  10,  10,  10,   5,
+           -5,   0,   0,   0,   0,   0,   0,  -5,
+           -5,   0,   0,   0,   0,   0,   0,  -5,
+           -5,   0,   0,   0,   0,   0,   0,  -5,
+           -5,   0,   0,   0,   0,   0,   0,  -5,
+           -5,   0,   0,   0,   0,   0,   0,  -5,
+            0,   0,   0,   5,   5,   0,   0,   0),
+    'Q': (-20, -10, -10,  -5,  -5, -10, -10, -20,
+          -10,   0,   0,   0,   0,   0,   0, -10,
+          -10,   0,   5,   5,   5,   5,   0, -10,
+           -5,   0,   5,   5,   5,   5,   0,  -5,
+            0,   0,   5,   5,   5,   5,   0,  -5,
+          -10,   5,   5,   5,   5,   5,   0, -10,
+          -10,   0,   5,   0,   0,   0,   0, -10,
+          -20, -10, -10,  -5,  -5, -10, -10, -20),
+    'K': (-30, -40, -40, -50, -50, -40, -40, -30,
+          -30, -40, -40, -50, -50, -40, -40, -30,
+          -30, -40, -40, -50, -50, -40, -40, -30,
+          -30, -40, -40, -50, -50, -40, -40, -30,
+          -20, -30, -30, -40, -40, -30, -30, -20,
+          -10, -20, -20, -20, -20, -20, -20, -10,
+           20,  20,   0,   0,   0,   0,  20,  20,
+           20,  30,  10,   0,   0,  10,  30,  20),
+}
 
-def sortFirst(val):
-    return val[1]
+# Only the king plays differently in the endgame: it should head for the centre
+PST_ENDGAME = dict(PST_MIDDLEGAME, K=(
+          -50, -40, -30, -20, -20, -30, -40, -50,
+          -30, -20, -10,   0,   0, -10, -20, -30,
+          -30, -10,  20,  30,  30,  20, -10, -30,
+          -30, -10,  30,  40,  40,  30, -10, -30,
+          -30, -10,  30,  40,  40,  30, -10, -30,
+          -30, -10,  20,  30,  30,  20, -10, -30,
+          -30, -30,   0,   0,   0,   0, -30, -30,
+          -50, -30, -30, -30, -30, -30, -30, -50))
+
+MAX_PHASE = 24
+PHASE_WEIGHTS = [0] * 128    # indexed by piece byte
+for piece, weight in (('N', 1), ('B', 1), ('R', 2), ('Q', 4)):
+    PHASE_WEIGHTS[ord(piece)] = PHASE_WEIGHTS[ord(piece.lower())] = weight
+
+# Per piece byte, the signed bonus on each square: White's from the table,
+# Black's negated from the table turned upside down
+def build_piece_square_tables(tables):
+    built = [[0] * 64 for piece in range(128)]
+    for piece, table in tables.items():
+        built[ord(piece)] = list(table)
+        built[ord(piece.lower())] = [-table[index ^ 56] for index in range(64)]
+    return built
+
+pst_middlegame = build_piece_square_tables(PST_MIDDLEGAME)
+pst_endgame = build_piece_square_tables(PST_ENDGAME)
+
+# Reads a JSON file of the form {"middlegame": {"P": [64 centipawns], ...},
+# "endgame": {...}}, every weight a whole number of centipawns so the
+# incremental sums stay exact. Pieces left out keep the default tables;
+# without an endgame section the middlegame tables are used for both.
+def load_piece_square_tables(path):
+    global pst_middlegame, pst_endgame
+    with open(path) as file:
+        weights = json.load(file)
+    check_piece_square_section("file", weights, ("middlegame", "endgame"))
+    for name, section in weights.items():
+        check_piece_square_section(name, section, PST_MIDDLEGAME)
+        for piece, table in section.items():
+            if (not isinstance(table, list) or len(table) != 64 or
+                    not all(type(value) is int for value in table)):
+                raise ValueError("%s table for %s needs a list of 64 whole centipawns" %
+                                 (name, piece))
+    middlegame = dict(PST_MIDDLEGAME, **weights.get("middlegame", {}))
+    endgame = dict(PST_ENDGAME if "endgame" in weights else middlegame,
+                   **weights.get("endgame", {}))
+    pst_middlegame = build_piece_square_tables(middlegame)
+    pst_endgame = build_piece_square_tables(endgame)
+    init_batch_tables()
+
+# Tables are given for White's pieces only (Black's are mirrored from them),
+# so a section must be an object whose keys are all in allowed
+def check_piece_square_section(name, section, allowed):
+    if not isinstance(section, dict):
+        raise ValueError("%s must be a JSON object" % name)
+    for key in section:
+        if key not in allowed:
+            raise ValueError("unknown key %r in %s; expected one of %s" %
+                             (key, name, ", ".join(allowed)))
+
+# (middlegame sum, endgame sum, phase) for the pieces on squares
+def piece_square_sums(squares):
+    middlegame = endgame = phase = 0
+    for index, piece in enumerate(squares):
+        middlegame += pst_middlegame[piece][index]
+        endgame += pst_endgame[piece][index]
+        phase += PHASE_WEIGHTS[piece]
+    return middlegame, endgame, phase
+
+# Piece-square bonus in pawns, the tapered blend rounded down to whole centipawns
+def piece_square_score(middlegame, endgame, phase):
+    if not use_tapered_eval:
+        return middlegame / 100
+    phase = min(phase, MAX_PHASE)
+    return (middlegame * phase + endgame * (MAX_PHASE - phase)) // MAX_PHASE / 100
+
+# Set by --check-eval: every node searched compares the incremental
+# evaluation against a full evaluate()
+check_incremental_eval = False
+
+class EvaluationMismatch(Exception):
+    pass
+
+# evaluate() for a Position in O(1)
+def evaluate_position(position):
+    value = position.material
+    if use_pst:
+        value += piece_square_score(position.pst_middlegame, position.pst_endgame, position.phase)
+    if check_incremental_eval:
+        check_evaluation(position, value)
+    return value
+
+def check_evaluation(position, value):
+    search_stats["eval_checks"] += 1
+    if value != evaluate(position):
+        raise EvaluationMismatch("incremental evaluation %s, evaluate() %s for\n%r" %
+                                 (value, evaluate(position), position.board()))
 
 ################################################################################
-#  Check if current state is a terminal state/checkmate
+#  Batch evaluation
 # ------------------------------------------------------------------------------
-#
-def test_checkmate(state, player):
-    # Get king position based on player
-    #enemy_king = 'k' if player == "WHITE" else 'K'
-    if(player == "WHITE"):
-        enemy_king = 'k'
-    else:
-        enemy_king = 'K'
-    king_row, king_col = 0, 0
-    # for row in range(len(state)):
-    #     try:
-    #         states = state[0]
-    #         king_col = states[row].index(enemy_king)
-    #         king_row = row
-    #         print(np.matrix(state))
-    #         print("col:", king_col)
-    #         print("row:", king_row)
-    #     except ValueError:
-    #         continue
-
-    for i in range(0,len(state)):
-            for j in range(0,len(state[0])):
-                if(state[i][j] == enemy_king):
-                    king_col = i
-                    king_row = j
-
-
-    is_checkmate = True
-    king_moves = []
-
-    if player == "BLACK":
-        move_king_black(state, king_moves, king_col, king_row)
-        for move in king_moves:
-            list = get_children(move[0], "WHITE")
-            list.sort(key = sortSecond, reverse = True)
-            if list[0][2] != 10000:
-                is_checkmate = False
-                break
-    else:
-        # move_king_white(state, king_moves, king_col, king_row)
-        # for move in king_moves:
-        #     list = get_children(move[0], "BLACK")
-        #     list.sort(key = sortSecond, reverse = True)
-        #     if(len(list) != 0):
-        #         if list[0][2] != 10000:
-        #             is_checkmate = False
-        #             break
-        is_checkmate = False
-
-    # if(is_checkmate):
-    #     print("Here", is_checkmate, player)
-    #     print(state)
-    return is_checkmate
+#  evaluate() for many boards at once: an (N, 64) int8 array of piece bytes
+#  is turned into N scores with NumPy fancy indexing into per-piece tables,
+#  so the per-board Python overhead is paid once per batch.
+
+# (material, middlegame, endgame, phase) tables as arrays; rebuilt on first
+# use after the piece-square tables change
+batch_tables = None
+
+def init_batch_tables():
+    global batch_tables
+    batch_tables = (np.array(MATERIAL_VALUES), np.array(pst_middlegame),
+                    np.array(pst_endgame), np.array(PHASE_WEIGHTS))
+
+def evaluate_batch(boards):
+    if batch_tables is None:
+        init_batch_tables()
+    material, middlegame, endgame, phase_weights = batch_tables
+    pieces = np.asarray(boards, dtype=np.int8).astype(np.intp)
+    scores = material[pieces].sum(axis=1)
+    if use_pst:
+        squares = np.arange(64)
+        middlegame_sums = middlegame[pieces, squares].sum(axis=1)
+        if use_tapered_eval:
+            endgame_sums = endgame[pieces, squares].sum(axis=1)
+            phase = np.minimum(phase_weights[pieces].sum(axis=1), MAX_PHASE)
+            scores = scores + ((middlegame_sums * phase + endgame_sums * (MAX_PHASE - phase)) //
+                               MAX_PHASE / 100)
+        else:
+            scores = scores + middlegame_sums / 100
+    return scores
 
+# The boards after each of moves from squares, as an (N, 64) array
+def child_boards(squares, moves):
+    boards = np.tile(np.frombuffer(bytes(squares), dtype=np.int8), (len(moves), 1))
+    rows = np.arange(len(moves))
+    moves = np.array(moves)
+    boards[rows, moves >> FROM_SHIFT & SQUARE_MASK] = EMPTY
+    boards[rows, moves & SQUARE_MASK] = moves >> PIECE_SHIFT & PIECE_MASK
+    return boards
 
 
 ################################################################################
-#  Return the list of all successor states for player given a certain state
+#  Cutoff test function - has terminal test inside it
 # ------------------------------------------------------------------------------
 #
-def get_children(state, player):
-    currentBoard = copy.deepcopy(state)
-    listOfPossibleStates = []    # list of reachable states
-
-    if player == "WHITE":
-        for i in range(0,len(currentBoard)):
-            for j in range(0,len(currentBoard[0])):
-
-                if(currentBoard[i][j] == 'P'):
-                    move_pawn_white(currentBoard, listOfPossibleStates, j, i)
-
-                elif(currentBoard[i][j] == 'N'):
-                    move_knight_white(currentBoard, listOfPossibleStates, j, i)
-
-                elif(currentBoard[i][j] == 'R'):
-                    move_rook_white(currentBoard, listOfPossibleStates, j, i)
-
-                elif(currentBoard[i][j] == 'B'):
-                    move_bishop_white(currentBoard, listOfPossibleStates, j, i)
-
-                elif(currentBoard[i][j] == 'Q'):
-                    move_queen_white(currentBoard, listOfPossibleStates, j, i)
-
-                elif(currentBoard[i][j] == 'K'):
-                    move_king_white(currentBoard, listOfPossibleStates, j, i)
-
-
-        return listOfPossibleStates
-
-    elif(player == "BLACK"):
-        for i in range(0,len(currentBoard)):
-            for j in range(0,len(currentBoard[0])):
-
-               if(currentBoard[i][j] == 'p'):
-                   move_pawn_black(currentBoard, listOfPossibleStates, j, i)
-
-               elif(currentBoard[i][j] == 'n'):
-                   move_knight_black(currentBoard, listOfPossibleStates, j, i)
+def cutoff_test(state, depth, player):
+    is_max_depth = False
+    is_checkmate = False
+    is_stalemate = False
 
-               elif(currentBoard[i][j] == 'r'):
-                   move_rook_black(currentBoard, listOfPossibleStates, j, i)
+    if depth >= search_max_depth: # assuming that depth starts at 1; reductions skip past it
+        is_max_depth = True
+        # Above the depth limit the search finds these by running out of legal moves
+        if not has_legal_move(state, player):
+            is_checkmate = in_check(state, player)
+            is_stalemate = not is_checkmate
 
-               elif(currentBoard[i][j] == 'b'):
-                   move_bishop_black(currentBoard, listOfPossibleStates, j, i)
+    return (is_max_depth, is_checkmate, is_stalemate)
 
-               elif(currentBoard[i][j] == 'q'):
-                   move_queen_black(currentBoard, listOfPossibleStates, j, i)
+def sortSecond(move):
+    return byte_values[move >> CAPTURED_SHIFT & PIECE_MASK]
 
-               elif(currentBoard[i][j] == 'k'):
-                   move_king_black(currentBoard, listOfPossibleStates, j, i)
+def sortFirst(move):
+    return move >> DISTANCE_SHIFT
 
-        return listOfPossibleStates
+################################################################################
+#  Return the list of all successor states for player given a certain state
+# ------------------------------------------------------------------------------
+#  Each child is a (board, distance moved, value of piece taken) tuple;
+#  generator picks the move generator from MOVE_GENERATORS
+def get_children(state, player, generator="table"):
+    position = MOVE_GENERATORS[generator](state)
+    return [(state.move(move.from_index, move.to_index, move.piece), move.distance, move.value)
+            for move in map(Move, position.generate_moves(player))]
 
-    else:
-        pass
+################################################################################
+#  Hand-unrolled move generators
+# ------------------------------------------------------------------------------
+#  One move_* function per piece and colour with every direction written
+#  out. Position generates from the move tables further down instead;
+#  UnrolledPosition (--movegen unrolled) keeps these as the reference that
+#  --compare-movegen checks the other generators against. With captures_only
+#  the quiet moves are skipped as they are generated. Only the squares in
+#  player's piece mask are visited.
+def generate_moves_unrolled(state, player, captures_only=False):
+    movers = PIECE_MOVERS[player]
+    squares = state.squares
+    moves = []
+
+    pieces = state.pieces[player]
+    while pieces:
+        bit = pieces & -pieces
+        pieces ^= bit
+        index = bit.bit_length() - 1
+        row, col = divmod(index, BOARD_SIZE)
+        movers[chr(squares[index])](state, moves, col, row, captures_only)
+
+    return moves
 
 
 #Adds all possible moves for a given white pawn to the child list
-def move_pawn_white(state, list, x_cord, y_cord):
-    enemy_set = set({'p', 'n', 'r', 'b', 'q', 'k'})
+def move_pawn_white(state, list, x_cord, y_cord, captures_only=False):
+    squares = state.squares
+    move_bits = (y_cord * 8 + x_cord) << FROM_SHIFT | ord('P') << PIECE_SHIFT
+    enemy_set = BLACK_PIECES
 
     #Pawn moves forward by one
     if(y_cord - 1 >= 0):
-        if(state[y_cord - 1][x_cord] == '_'):
-            newBoard = copy.deepcopy(state)
-            newBoard[y_cord - 1][x_cord] = 'P'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, 1, 0))
+        to_index = (y_cord - 1) * 8 + x_cord
+        if(squares[to_index] == EMPTY and not captures_only):
+            list.append(move_bits | to_index | EMPTY << CAPTURED_SHIFT |
+                        1 << DISTANCE_SHIFT)
 
     #Pawn takes enemy piece to the top right of it
-    if((y_cord - 1) >= 0 and (x_cord + 1) < len(state)):
-        if(state[y_cord - 1][x_cord + 1] in enemy_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord - 1][x_cord + 1]]
-            newBoard[y_cord - 1][x_cord + 1] = 'P'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, 1, value))
+    if((y_cord - 1) >= 0 and (x_cord + 1) < BOARD_SIZE):
+        to_index = (y_cord - 1) * 8 + x_cord + 1
+        if(squares[to_index] in enemy_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        1 << DISTANCE_SHIFT)
 
     #Pawn takes enemy piece to the top left of it
     if((y_cord - 1) >= 0 and (x_cord - 1) >= 0):
-        if(state[y_cord - 1][x_cord - 1] in enemy_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord - 1][x_cord - 1]]
-            newBoard[y_cord - 1][x_cord - 1] = 'P'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, 1, value))
+        to_index = (y_cord - 1) * 8 + x_cord - 1
+        if(squares[to_index] in enemy_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        1 << DISTANCE_SHIFT)
 
 #Adds all possible moves for a given white knight to the child list
-def move_knight_white(state, list, x_cord, y_cord):
-    friendly_set = set({'P', 'N', 'R', 'B', 'Q', 'K'})
+def move_knight_white(state, list, x_cord, y_cord, captures_only=False):
+    squares = state.squares
+    move_bits = (y_cord * 8 + x_cord) << FROM_SHIFT | ord('N') << PIECE_SHIFT
+    friendly_set = WHITE_PIECES
+    if captures_only:
+        friendly_set = WHITE_PIECES_OR_EMPTY    # squares it may not move to
 
     #Piece moves up one and left two
     if(y_cord - 1 >= 0 and x_cord - 2 >= 0):
-        if(state[y_cord - 1][x_cord - 2] not in friendly_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord - 1][x_cord - 2]]
-            newBoard[y_cord - 1][x_cord - 2] = 'N'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, 3, value))
+        to_index = (y_cord - 1) * 8 + x_cord - 2
+        if(squares[to_index] not in friendly_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        3 << DISTANCE_SHIFT)
 
     #Piece moves up one and right two
-    if(y_cord - 1 >= 0 and x_cord + 2 < len(state)):
-        if(state[y_cord - 1][x_cord + 2] not in friendly_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord - 1][x_cord + 2]]
-            newBoard[y_cord - 1][x_cord + 2] = 'N'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, 3, value))
+    if(y_cord - 1 >= 0 and x_cord + 2 < BOARD_SIZE):
+        to_index = (y_cord - 1) * 8 + x_cord + 2
+        if(squares[to_index] not in friendly_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        3 << DISTANCE_SHIFT)
 
     #Piece moves up two and left one
     if(y_cord - 2 >= 0 and x_cord - 1 >= 0):
-        if(state[y_cord - 2][x_cord - 1] not in friendly_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord - 2][x_cord - 1]]
-            newBoard[y_cord - 2][x_cord - 1] = 'N'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, 3, value))
+        to_index = (y_cord - 2) * 8 + x_cord - 1
+        if(squares[to_index] not in friendly_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        3 << DISTANCE_SHIFT)
 
     #Piece moves up two and right one
-    if(y_cord - 2 >= 0 and x_cord + 1 < len(state)):
-        if(state[y_cord - 2][x_cord + 1] not in friendly_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord - 2][x_cord + 1]]
-            newBoard[y_cord - 2][x_cord +1] = 'N'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, 3, value))
+    if(y_cord - 2 >= 0 and x_cord + 1 < BOARD_SIZE):
+        to_index = (y_cord - 2) * 8 + x_cord + 1
+        if(squares[to_index] not in friendly_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        3 << DISTANCE_SHIFT)
 
     #Piece moves down one and right two
-    if(y_cord + 1 < len(state) and x_cord + 2 < len(state)):
-        if(state[y_cord + 1][x_cord + 2] not in friendly_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord + 1][x_cord + 2]]
-            newBoard[y_cord + 1][x_cord + 2] = 'N'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, 3, value))
+    if(y_cord + 1 < BOARD_SIZE and x_cord + 2 < BOARD_SIZE):
+        to_index = (y_cord + 1) * 8 + x_cord + 2
+        if(squares[to_index] not in friendly_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        3 << DISTANCE_SHIFT)
 
     #Piece moves down one and left two
-    if(y_cord + 1 < len(state) and x_cord - 2 >= 0):
-        if(state[y_cord + 1][x_cord - 2] not in friendly_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord + 1][x_cord - 2]]
-            newBoard[y_cord + 1][x_cord - 2] = 'N'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, 3, value))
+    if(y_cord + 1 < BOARD_SIZE and x_cord - 2 >= 0):
+        to_index = (y_cord + 1) * 8 + x_cord - 2
+        if(squares[to_index] not in friendly_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        3 << DISTANCE_SHIFT)
 
     #Piece moves down 2 and right 1
-    if(y_cord + 2 < len(state) and x_cord + 1 < len(state)):
-        if(state[y_cord + 2][x_cord + 1] not in friendly_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord + 2][x_cord + 1]]
-            newBoard[y_cord + 2][x_cord + 1] = 'N'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, 3, value))
+    if(y_cord + 2 < BOARD_SIZE and x_cord + 1 < BOARD_SIZE):
+        to_index = (y_cord + 2) * 8 + x_cord + 1
+        if(squares[to_index] not in friendly_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        3 << DISTANCE_SHIFT)
 
     #Piece moves down 2 and left 1
-    if(y_cord + 2 < len(state) and x_cord - 1 >= 0):
-        if(state[y_cord + 2][x_cord - 1] not in friendly_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord + 2][x_cord - 1]]
-            newBoard[y_cord + 2][x_cord - 1] = 'N'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, 3, value))
+    if(y_cord + 2 < BOARD_SIZE and x_cord - 1 >= 0):
+        to_index = (y_cord + 2) * 8 + x_cord - 1
+        if(squares[to_index] not in friendly_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        3 << DISTANCE_SHIFT)
 
 
-def move_rook_white(state, list, x_cord, y_cord):
-    enemy_set = set({'p', 'n', 'r', 'b', 'q', 'k'})
-    friendly_set = set({'P', 'N', 'R', 'B', 'Q', 'K'})
+def move_rook_white(state, list, x_cord, y_cord, captures_only=False):
+    squares = state.squares
+    move_bits = (y_cord * 8 + x_cord) << FROM_SHIFT | ord('R') << PIECE_SHIFT
+    enemy_set = BLACK_PIECES
+    friendly_set = WHITE_PIECES
 
     # Move up direction
     move_counter = 0
     for y in range(y_cord-1, -1, -1):
         move_counter = move_counter + 1
+        to_index = y * 8 + x_cord
 
-        if(state[y][x_cord] in friendly_set):
+        if(squares[to_index] in friendly_set):
             break
 
-        if(state[y][x_cord] in enemy_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y][x_cord]]
-            newBoard[y][x_cord] = 'R'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, move_counter, value))
+        if(squares[to_index] in enemy_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        move_counter << DISTANCE_SHIFT)
             break
 
-        if state[y][x_cord] == '_':
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y][x_cord]]
-            newBoard[y][x_cord] = 'R'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, move_counter, value))
+        if squares[to_index] == EMPTY and not captures_only:
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        move_counter << DISTANCE_SHIFT)
 
     # Move down direction
     move_counter = 0
-    for y in range(y_cord+1, len(state), 1):
+    for y in range(y_cord+1, BOARD_SIZE, 1):
         move_counter = move_counter + 1
+        to_index = y * 8 + x_cord
 
-        if(state[y][x_cord] in friendly_set):
+        if(squares[to_index] in friendly_set):
             break
 
-        if(state[y][x_cord] in enemy_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y][x_cord]]
-            newBoard[y][x_cord] = 'R'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, move_counter, value))
+        if(squares[to_index] in enemy_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        move_counter << DISTANCE_SHIFT)
             break
 
-        if state[y][x_cord] == '_':
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y][x_cord]]
-            newBoard[y][x_cord] = 'R'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, move_counter, value))
+        if squares[to_index] == EMPTY and not captures_only:
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        move_counter << DISTANCE_SHIFT)
 
     # Move left direction
     move_counter = 0
     for x in range(x_cord-1, -1, -1):
         move_counter = move_counter + 1
+        to_index = y_cord * 8 + x
 
-        if(state[y_cord][x] in friendly_set):
+        if(squares[to_index] in friendly_set):
             break
 
-        if(state[y_cord][x] in enemy_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord][x]]
-            newBoard[y_cord][x] = 'R'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, move_counter, value))
+        if(squares[to_index] in enemy_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        move_counter << DISTANCE_SHIFT)
             break
 
-        if state[y_cord][x] == '_':
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord][x]]
-            newBoard[y_cord][x] = 'R'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, move_counter, value))
+        if squares[to_index] == EMPTY and not captures_only:
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        move_counter << DISTANCE_SHIFT)
 
     # Move right direction
     move_counter = 0
-    for x in range(x_cord+1, len(state), 1):
+    for x in range(x_cord+1, BOARD_SIZE, 1):
         move_counter = move_counter + 1
-        if(state[y_cord][x] in friendly_set):
+        to_index = y_cord * 8 + x
+        if(squares[to_index] in friendly_set):
             break
 
-        if(state[y_cord][x] in enemy_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord][x]]
-            newBoard[y_cord][x] = 'R'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, move_counter, value))
+        if(squares[to_index] in enemy_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        move_counter << DISTANCE_SHIFT)
             break
 
-        if state[y_cord][x] == '_':
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord][x]]
-            newBoard[y_cord][x] = 'R'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, move_counter, value))
+        if squares[to_index] == EMPTY and not captures_only:
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        move_counter << DISTANCE_SHIFT)
 
 
-def move_bishop_white(state, list, x_cord, y_cord):
-    enemy_set = set({'p', 'n', 'r', 'b', 'q', 'k'})
-    friendly_set = set({'P', 'N', 'R', 'B', 'Q', 'K'})
+def move_bishop_white(state, list, x_cord, y_cord, captures_only=False):
+    squares = state.squares
+    move_bits = (y_cord * 8 + x_cord) << FROM_SHIFT | ord('B') << PIECE_SHIFT
+    enemy_set = BLACK_PIECES
+    friendly_set = WHITE_PIECES
     inBounds = True
 
     # Move up-left direction
@@ -487,27 +918,22 @@ def move_bishop_white(state, list, x_cord, y_cord):
     x = x_cord
     move_counter = 0
     while(inBounds):
-        if(y - 1 >= 0 and x + 1 < len(state)):
+        if(y - 1 >= 0 and x + 1 < BOARD_SIZE):
             y = y - 1
             x = x + 1
             move_counter = move_counter + 1
-            if(state[y][x] in friendly_set):
+            to_index = y * 8 + x
+            if(squares[to_index] in friendly_set):
                 break
 
-            if(state[y][x] in enemy_set):
-                newBoard = copy.deepcopy(state)
-                value = piece_values[newBoard[y][x]]
-                newBoard[y][x] = 'B'
-                newBoard[y_cord][x_cord] = '_'
-                list.append((newBoard, move_counter, value))
+            if(squares[to_index] in enemy_set):
+                list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                            move_counter << DISTANCE_SHIFT)
                 break
 
-            if state[y][x] == '_':
-                newBoard = copy.deepcopy(state)
-                value = piece_values[newBoard[y][x]]
-                newBoard[y][x] = 'B'
-                newBoard[y_cord][x_cord] = '_'
-                list.append((newBoard, move_counter, value))
+            if squares[to_index] == EMPTY and not captures_only:
+                list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                            move_counter << DISTANCE_SHIFT)
         else:
             inBounds = False
 
@@ -521,23 +947,18 @@ def move_bishop_white(state, list, x_cord, y_cord):
             y = y - 1
             x = x - 1
             move_counter = move_counter + 1
-            if(state[y][x] in friendly_set):
+            to_index = y * 8 + x
+            if(squares[to_index] in friendly_set):
                 break
 
-            if(state[y][x] in enemy_set):
-                newBoard = copy.deepcopy(state)
-                value = piece_values[newBoard[y][x]]
-                newBoard[y][x] = 'B'
-                newBoard[y_cord][x_cord] = '_'
-                list.append((newBoard, move_counter, value))
+            if(squares[to_index] in enemy_set):
+                list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                            move_counter << DISTANCE_SHIFT)
                 break
 
-            if state[y][x] == '_':
-                newBoard = copy.deepcopy(state)
-                value = piece_values[newBoard[y][x]]
-                newBoard[y][x] = 'B'
-                newBoard[y_cord][x_cord] = '_'
-                list.append((newBoard, move_counter, value))
+            if squares[to_index] == EMPTY and not captures_only:
+                list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                            move_counter << DISTANCE_SHIFT)
         else:
             inBounds = False
 
@@ -547,27 +968,22 @@ def move_bishop_white(state, list, x_cord, y_cord):
     x = x_cord
     move_counter = 0
     while(inBounds):
-        if(y + 1 < len(state) and x - 1 >= 0):
+        if(y + 1 < BOARD_SIZE and x - 1 >= 0):
             y = y + 1
             x = x - 1
             move_counter = move_counter + 1
-            if(state[y][x] in friendly_set):
+            to_index = y * 8 + x
+            if(squares[to_index] in friendly_set):
                 break
 
-            if(state[y][x] in enemy_set):
-                newBoard = copy.deepcopy(state)
-                value = piece_values[newBoard[y][x]]
-                newBoard[y][x] = 'B'
-                newBoard[y_cord][x_cord] = '_'
-                list.append((newBoard, move_counter, value))
+            if(squares[to_index] in enemy_set):
+                list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                            move_counter << DISTANCE_SHIFT)
                 break
 
-            if state[y][x] == '_':
-                newBoard = copy.deepcopy(state)
-                value = piece_values[newBoard[y][x]]
-                newBoard[y][x] = 'B'
-                newBoard[y_cord][x_cord] = '_'
-                list.append((newBoard, move_counter, value))
+            if squares[to_index] == EMPTY and not captures_only:
+                list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                            move_counter << DISTANCE_SHIFT)
         else:
             inBounds = False
 
@@ -577,33 +993,30 @@ def move_bishop_white(state, list, x_cord, y_cord):
     x = x_cord
     move_counter = 0
     while(inBounds):
-        if(y + 1 < len(state) and x + 1 < len(state)):
+        if(y + 1 < BOARD_SIZE and x + 1 < BOARD_SIZE):
             y = y + 1
             x = x + 1
             move_counter = move_counter + 1
-            if(state[y][x] in friendly_set):
+            to_index = y * 8 + x
+            if(squares[to_index] in friendly_set):
                 break
 
-            if(state[y][x] in enemy_set):
-                newBoard = copy.deepcopy(state)
-                value = piece_values[newBoard[y][x]]
-                newBoard[y][x] = 'B'
-                newBoard[y_cord][x_cord] = '_'
-                list.append((newBoard, move_counter, value))
+            if(squares[to_index] in enemy_set):
+                list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                            move_counter << DISTANCE_SHIFT)
                 break
 
-            if state[y][x] == '_':
-                newBoard = copy.deepcopy(state)
-                value = piece_values[newBoard[y][x]]
-                newBoard[y][x] = 'B'
-                newBoard[y_cord][x_cord] = '_'
-                list.append((newBoard, move_counter, value))
+            if squares[to_index] == EMPTY and not captures_only:
+                list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                            move_counter << DISTANCE_SHIFT)
         else:
             inBounds = False
 
-def move_queen_white(state, list, x_cord, y_cord):
-    enemy_set = set({'p', 'n', 'r', 'b', 'q', 'k'})
-    friendly_set = set({'P', 'N', 'R', 'B', 'Q', 'K'})
+def move_queen_white(state, list, x_cord, y_cord, captures_only=False):
+    squares = state.squares
+    move_bits = (y_cord * 8 + x_cord) << FROM_SHIFT | ord('Q') << PIECE_SHIFT
+    enemy_set = BLACK_PIECES
+    friendly_set = WHITE_PIECES
     inBounds = True
 
     # Move up-left direction
@@ -611,27 +1024,22 @@ def move_queen_white(state, list, x_cord, y_cord):
     x = x_cord
     move_counter = 0
     while(inBounds):
-        if(y - 1 >= 0 and x + 1 < len(state)):
+        if(y - 1 >= 0 and x + 1 < BOARD_SIZE):
             y = y - 1
             x = x + 1
             move_counter = move_counter + 1
-            if(state[y][x] in friendly_set):
+            to_index = y * 8 + x
+            if(squares[to_index] in friendly_set):
                 break
 
-            if(state[y][x] in enemy_set):
-                newBoard = copy.deepcopy(state)
-                value = piece_values[newBoard[y][x]]
-                newBoard[y][x] = 'Q'
-                newBoard[y_cord][x_cord] = '_'
-                list.append((newBoard, move_counter, value))
+            if(squares[to_index] in enemy_set):
+                list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                            move_counter << DISTANCE_SHIFT)
                 break
 
-            if state[y][x] == '_':
-                newBoard = copy.deepcopy(state)
-                value = piece_values[newBoard[y][x]]
-                newBoard[y][x] = 'Q'
-                newBoard[y_cord][x_cord] = '_'
-                list.append((newBoard, move_counter, value))
+            if squares[to_index] == EMPTY and not captures_only:
+                list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                            move_counter << DISTANCE_SHIFT)
         else:
             inBounds = False
 
@@ -645,23 +1053,18 @@ def move_queen_white(state, list, x_cord, y_cord):
             y = y - 1
             x = x - 1
             move_counter = move_counter + 1
-            if(state[y][x] in friendly_set):
+            to_index = y * 8 + x
+            if(squares[to_index] in friendly_set):
                 break
 
-            if(state[y][x] in enemy_set):
-                newBoard = copy.deepcopy(state)
-                value = piece_values[newBoard[y][x]]
-                newBoard[y][x] = 'Q'
-                newBoard[y_cord][x_cord] = '_'
-                list.append((newBoard, move_counter, value))
+            if(squares[to_index] in enemy_set):
+                list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                            move_counter << DISTANCE_SHIFT)
                 break
 
-            if state[y][x] == '_':
-                newBoard = copy.deepcopy(state)
-                value = piece_values[newBoard[y][x]]
-                newBoard[y][x] = 'Q'
-                newBoard[y_cord][x_cord] = '_'
-                list.append((newBoard, move_counter, value))
+            if squares[to_index] == EMPTY and not captures_only:
+                list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                            move_counter << DISTANCE_SHIFT)
         else:
             inBounds = False
 
@@ -671,27 +1074,22 @@ def move_queen_white(state, list, x_cord, y_cord):
     x = x_cord
     move_counter = 0
     while(inBounds):
-        if(y + 1 < len(state) and x - 1 >= 0):
+        if(y + 1 < BOARD_SIZE and x - 1 >= 0):
             y = y + 1
             x = x - 1
             move_counter = move_counter + 1
-            if(state[y][x] in friendly_set):
+            to_index = y * 8 + x
+            if(squares[to_index] in friendly_set):
                 break
 
-            if(state[y][x] in enemy_set):
-                newBoard = copy.deepcopy(state)
-                value = piece_values[newBoard[y][x]]
-                newBoard[y][x] = 'Q'
-                newBoard[y_cord][x_cord] = '_'
-                list.append((newBoard, move_counter, value))
+            if(squares[to_index] in enemy_set):
+                list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                            move_counter << DISTANCE_SHIFT)
                 break
 
-            if state[y][x] == '_':
-                newBoard = copy.deepcopy(state)
-                value = piece_values[newBoard[y][x]]
-                newBoard[y][x] = 'Q'
-                newBoard[y_cord][x_cord] = '_'
-                list.append((newBoard, move_counter, value))
+            if squares[to_index] == EMPTY and not captures_only:
+                list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                            move_counter << DISTANCE_SHIFT)
         else:
             inBounds = False
 
@@ -701,27 +1099,22 @@ def move_queen_white(state, list, x_cord, y_cord):
     x = x_cord
     move_counter = 0
     while(inBounds):
-        if(y + 1 < len(state) and x + 1 < len(state)):
+        if(y + 1 < BOARD_SIZE and x + 1 < BOARD_SIZE):
             y = y + 1
             x = x + 1
             move_counter = move_counter + 1
-            if(state[y][x] in friendly_set):
+            to_index = y * 8 + x
+            if(squares[to_index] in friendly_set):
                 break
 
-            if(state[y][x] in enemy_set):
-                newBoard = copy.deepcopy(state)
-                value = piece_values[newBoard[y][x]]
-                newBoard[y][x] = 'Q'
-                newBoard[y_cord][x_cord] = '_'
-                list.append((newBoard, move_counter, value))
+            if(squares[to_index] in enemy_set):
+                list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                            move_counter << DISTANCE_SHIFT)
                 break
 
-            if state[y][x] == '_':
-                newBoard = copy.deepcopy(state)
-                value = piece_values[newBoard[y][x]]
-                newBoard[y][x] = 'Q'
-                newBoard[y_cord][x_cord] = '_'
-                list.append((newBoard, move_counter, value))
+            if squares[to_index] == EMPTY and not captures_only:
+                list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                            move_counter << DISTANCE_SHIFT)
         else:
             inBounds = False
 
@@ -729,382 +1122,319 @@ def move_queen_white(state, list, x_cord, y_cord):
     move_counter = 0
     for y in range(y_cord-1, -1, -1):
         move_counter = move_counter + 1
+        to_index = y * 8 + x_cord
 
-        if(state[y][x_cord] in friendly_set):
+        if(squares[to_index] in friendly_set):
             break
 
-        if(state[y][x_cord] in enemy_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y][x_cord]]
-            newBoard[y][x_cord] = 'Q'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, move_counter, value))
+        if(squares[to_index] in enemy_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        move_counter << DISTANCE_SHIFT)
             break
 
-        if state[y][x_cord] == '_':
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y][x_cord]]
-            newBoard[y][x_cord] = 'Q'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, move_counter, value))
+        if squares[to_index] == EMPTY and not captures_only:
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        move_counter << DISTANCE_SHIFT)
 
     # Move down direction
     move_counter = 0
-    for y in range(y_cord+1, len(state), 1):
+    for y in range(y_cord+1, BOARD_SIZE, 1):
         move_counter = move_counter + 1
+        to_index = y * 8 + x_cord
 
-        if(state[y][x_cord] in friendly_set):
+        if(squares[to_index] in friendly_set):
             break
 
-        if(state[y][x_cord] in enemy_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y][x_cord]]
-            newBoard[y][x_cord] = 'Q'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, move_counter, value))
+        if(squares[to_index] in enemy_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        move_counter << DISTANCE_SHIFT)
             break
 
-        if state[y][x_cord] == '_':
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y][x_cord]]
-            newBoard[y][x_cord] = 'Q'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, move_counter, value))
+        if squares[to_index] == EMPTY and not captures_only:
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        move_counter << DISTANCE_SHIFT)
 
     # Move left direction
     move_counter = 0
     for x in range(x_cord-1, -1, -1):
         move_counter = move_counter + 1
+        to_index = y_cord * 8 + x
 
-        if(state[y_cord][x] in friendly_set):
+        if(squares[to_index] in friendly_set):
             break
 
-        if(state[y_cord][x] in enemy_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord][x]]
-            newBoard[y_cord][x] = 'Q'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, move_counter, value))
+        if(squares[to_index] in enemy_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        move_counter << DISTANCE_SHIFT)
             break
 
-        if state[y_cord][x] == '_':
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord][x]]
-            newBoard[y_cord][x] = 'Q'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, move_counter, value))
+        if squares[to_index] == EMPTY and not captures_only:
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        move_counter << DISTANCE_SHIFT)
 
     # Move right direction
     move_counter = 0
-    for x in range(x_cord+1, len(state), 1):
+    for x in range(x_cord+1, BOARD_SIZE, 1):
         move_counter = move_counter + 1
+        to_index = y_cord * 8 + x
 
-        if(state[y_cord][x] in friendly_set):
+        if(squares[to_index] in friendly_set):
             break
 
-        if(state[y_cord][x] in enemy_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord][x]]
-            newBoard[y_cord][x] = 'Q'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, move_counter, value))
+        if(squares[to_index] in enemy_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        move_counter << DISTANCE_SHIFT)
             break
 
-        if state[y_cord][x] == '_':
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord][x]]
-            newBoard[y_cord][x] = 'Q'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, move_counter, value))
+        if squares[to_index] == EMPTY and not captures_only:
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        move_counter << DISTANCE_SHIFT)
 
-def move_king_white(state, list, x_cord, y_cord):
-    enemy_set = set({'p', 'n', 'r', 'b', 'q', 'k'})
-    friendly_set = set({'P', 'N', 'R', 'B', 'Q', 'K'})
+def move_king_white(state, list, x_cord, y_cord, captures_only=False):
+    squares = state.squares
+    move_bits = (y_cord * 8 + x_cord) << FROM_SHIFT | ord('K') << PIECE_SHIFT
+    enemy_set = BLACK_PIECES
+    friendly_set = WHITE_PIECES
+    if captures_only:
+        friendly_set = WHITE_PIECES_OR_EMPTY    # squares it may not move to
 
     # Move up-left direction
-    if(y_cord - 1 >= 0 and x_cord + 1 < len(state)):
-        if(state[y_cord - 1][x_cord + 1] not in friendly_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord - 1][x_cord + 1]]
-            newBoard[y_cord - 1][x_cord + 1] = 'K'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, 1, value))
+    if(y_cord - 1 >= 0 and x_cord + 1 < BOARD_SIZE):
+        to_index = (y_cord - 1) * 8 + x_cord + 1
+        if(squares[to_index] not in friendly_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        1 << DISTANCE_SHIFT)
 
 
     # Move up-right direction
     if(y_cord - 1 >= 0 and x_cord - 1 >= 0):
-        if(state[y_cord - 1][x_cord - 1] not in friendly_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord - 1][x_cord - 1]]
-            newBoard[y_cord - 1][x_cord - 1] = 'K'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, 1, value))
+        to_index = (y_cord - 1) * 8 + x_cord - 1
+        if(squares[to_index] not in friendly_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        1 << DISTANCE_SHIFT)
 
 
     # Move down-left direction
-    if(y_cord + 1 < len(state) and x_cord - 1 >= 0):
-        if(state[y_cord + 1][x_cord - 1] not in friendly_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord + 1][x_cord - 1]]
-            newBoard[y_cord + 1][x_cord - 1] = 'K'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, 1, value))
+    if(y_cord + 1 < BOARD_SIZE and x_cord - 1 >= 0):
+        to_index = (y_cord + 1) * 8 + x_cord - 1
+        if(squares[to_index] not in friendly_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        1 << DISTANCE_SHIFT)
 
 
     # Move down-right direction
-    if(y_cord + 1 < len(state) and x_cord + 1 < len(state)):
-        if(state[y_cord + 1][x_cord + 1] not in friendly_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord + 1][x_cord + 1]]
-            newBoard[y_cord + 1][x_cord + 1] = 'K'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, 1, value))
+    if(y_cord + 1 < BOARD_SIZE and x_cord + 1 < BOARD_SIZE):
+        to_index = (y_cord + 1) * 8 + x_cord + 1
+        if(squares[to_index] not in friendly_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        1 << DISTANCE_SHIFT)
 
 
     # Move up direction
     if(y_cord - 1 >= 0):
-        if(state[y_cord - 1][x_cord] not in friendly_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord - 1][x_cord]]
-            newBoard[y_cord - 1][x_cord] = 'K'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, 1, value))
+        to_index = (y_cord - 1) * 8 + x_cord
+        if(squares[to_index] not in friendly_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        1 << DISTANCE_SHIFT)
 
 
     # Move down direction
-    if(y_cord + 1 < len(state)):
-        if(state[y_cord + 1][x_cord] not in friendly_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord + 1][x_cord]]
-            newBoard[y_cord + 1][x_cord] = 'K'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, 1, value))
+    if(y_cord + 1 < BOARD_SIZE):
+        to_index = (y_cord + 1) * 8 + x_cord
+        if(squares[to_index] not in friendly_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        1 << DISTANCE_SHIFT)
 
 
     # Move left direction
     if(x_cord - 1 >= 0):
-        if(state[y_cord][x_cord - 1] not in friendly_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord][x_cord - 1]]
-            newBoard[y_cord][x_cord - 1] = 'K'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, 1, value))
+        to_index = y_cord * 8 + x_cord - 1
+        if(squares[to_index] not in friendly_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        1 << DISTANCE_SHIFT)
 
 
     # Move right direction
-    if(x_cord + 1 < len(state)):
-        if(state[y_cord][x_cord + 1] not in friendly_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord][x_cord + 1]]
-            newBoard[y_cord][x_cord + 1] = 'K'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, 1, value))
+    if(x_cord + 1 < BOARD_SIZE):
+        to_index = y_cord * 8 + x_cord + 1
+        if(squares[to_index] not in friendly_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        1 << DISTANCE_SHIFT)
 
 
 
 #Adds all possible moves for a given black pawn to the child list
-def move_pawn_black(state, list, x_cord, y_cord):
-    enemy_set = set({'P', 'N', 'R', 'B', 'Q', 'K'})
+def move_pawn_black(state, list, x_cord, y_cord, captures_only=False):
+    squares = state.squares
+    move_bits = (y_cord * 8 + x_cord) << FROM_SHIFT | ord('p') << PIECE_SHIFT
+    enemy_set = WHITE_PIECES
 
     #Pawn moves down by 1 space
-    if(y_cord + 1 < len(state)):
-        if(state[y_cord + 1][x_cord] == '_'):
-            newBoard = copy.deepcopy(state)
-            newBoard[y_cord + 1][x_cord] = 'p'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, 1, 0))
+    if(y_cord + 1 < BOARD_SIZE):
+        to_index = (y_cord + 1) * 8 + x_cord
+        if(squares[to_index] == EMPTY and not captures_only):
+            list.append(move_bits | to_index | EMPTY << CAPTURED_SHIFT |
+                        1 << DISTANCE_SHIFT)
 
     #Pawn takes piece to the bottom right of it
-    if((y_cord + 1) < len(state) and (x_cord + 1) < len(state)):
-        if(state[y_cord + 1][x_cord + 1] in enemy_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord + 1][x_cord + 1]]
-            newBoard[y_cord + 1][x_cord + 1] = 'p'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, 1, value))
+    if((y_cord + 1) < BOARD_SIZE and (x_cord + 1) < BOARD_SIZE):
+        to_index = (y_cord + 1) * 8 + x_cord + 1
+        if(squares[to_index] in enemy_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        1 << DISTANCE_SHIFT)
     #Pawn takes piece to the bottom left of it
-    if((y_cord + 1) < len(state) and (x_cord - 1) >= 0):
-        if(state[y_cord + 1][x_cord - 1] in enemy_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord + 1][x_cord - 1]]
-            newBoard[y_cord + 1][x_cord - 1] = 'p'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, 1, value))
+    if((y_cord + 1) < BOARD_SIZE and (x_cord - 1) >= 0):
+        to_index = (y_cord + 1) * 8 + x_cord - 1
+        if(squares[to_index] in enemy_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        1 << DISTANCE_SHIFT)
 
 #Adds all possible moves for a given white knight to the child list
-def move_knight_black(state, list, x_cord, y_cord):
-    friendly_set = set({'p', 'n', 'r', 'b', 'q', 'k'})
+def move_knight_black(state, list, x_cord, y_cord, captures_only=False):
+    squares = state.squares
+    move_bits = (y_cord * 8 + x_cord) << FROM_SHIFT | ord('n') << PIECE_SHIFT
+    friendly_set = BLACK_PIECES
+    if captures_only:
+        friendly_set = BLACK_PIECES_OR_EMPTY    # squares it may not move to
 
     #Piece moves up one and left two
     if(y_cord - 1 >= 0 and x_cord - 2 >= 0):
-        if(state[y_cord - 1][x_cord - 2] not in friendly_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord - 1][x_cord - 2]]
-            newBoard[y_cord - 1][x_cord - 2] = 'n'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, 3, value))
+        to_index = (y_cord - 1) * 8 + x_cord - 2
+        if(squares[to_index] not in friendly_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        3 << DISTANCE_SHIFT)
 
     #Piece moves up one and right two
-    if(y_cord - 1 >= 0 and x_cord + 2 < len(state)):
-        if(state[y_cord - 1][x_cord + 2] not in friendly_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord - 1][x_cord + 2]]
-            newBoard[y_cord - 1][x_cord + 2] = 'n'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, 3, value))
+    if(y_cord - 1 >= 0 and x_cord + 2 < BOARD_SIZE):
+        to_index = (y_cord - 1) * 8 + x_cord + 2
+        if(squares[to_index] not in friendly_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        3 << DISTANCE_SHIFT)
 
     #Piece moves up two and left one
     if(y_cord - 2 >= 0 and x_cord - 1 >= 0):
-        if(state[y_cord - 2][x_cord - 1] not in friendly_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord - 2][x_cord - 1]]
-            newBoard[y_cord - 2][x_cord - 1] = 'n'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, 3, value))
+        to_index = (y_cord - 2) * 8 + x_cord - 1
+        if(squares[to_index] not in friendly_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        3 << DISTANCE_SHIFT)
 
     #Piece moves up two and right one
-    if(y_cord - 2 >= 0 and x_cord + 1 < len(state)):
-        if(state[y_cord - 2][x_cord + 1] not in friendly_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord - 2][x_cord + 1]]
-            newBoard[y_cord - 2][x_cord +1] = 'n'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, 3, value))
+    if(y_cord - 2 >= 0 and x_cord + 1 < BOARD_SIZE):
+        to_index = (y_cord - 2) * 8 + x_cord + 1
+        if(squares[to_index] not in friendly_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        3 << DISTANCE_SHIFT)
 
     #Piece moves down one and right two
-    if(y_cord + 1 < len(state) and x_cord + 2 < len(state)):
-        if(state[y_cord + 1][x_cord + 2] not in friendly_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord + 1][x_cord + 2]]
-            newBoard[y_cord + 1][x_cord + 2] = 'n'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, 3, value))
+    if(y_cord + 1 < BOARD_SIZE and x_cord + 2 < BOARD_SIZE):
+        to_index = (y_cord + 1) * 8 + x_cord + 2
+        if(squares[to_index] not in friendly_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        3 << DISTANCE_SHIFT)
 
     #Piece moves down one and left two
-    if(y_cord + 1 < len(state) and x_cord - 2 >= 0):
-        if(state[y_cord + 1][x_cord - 2] not in friendly_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord + 1][x_cord - 2]]
-            newBoard[y_cord + 1][x_cord - 2] = 'n'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, 3, value))
+    if(y_cord + 1 < BOARD_SIZE and x_cord - 2 >= 0):
+        to_index = (y_cord + 1) * 8 + x_cord - 2
+        if(squares[to_index] not in friendly_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        3 << DISTANCE_SHIFT)
 
     #Piece moves down 2 and right 1
-    if(y_cord + 2 < len(state) and x_cord + 1 < len(state)):
-        if(state[y_cord + 2][x_cord + 1] not in friendly_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord + 2][x_cord + 1]]
-            newBoard[y_cord + 2][x_cord + 1] = 'n'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, 3, value))
+    if(y_cord + 2 < BOARD_SIZE and x_cord + 1 < BOARD_SIZE):
+        to_index = (y_cord + 2) * 8 + x_cord + 1
+        if(squares[to_index] not in friendly_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        3 << DISTANCE_SHIFT)
 
     #Piece moves down 2 and left 1
-    if(y_cord + 2 < len(state) and x_cord - 1 >= 0):
-        if(state[y_cord + 2][x_cord - 1] not in friendly_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord + 2][x_cord - 1]]
-            newBoard[y_cord + 2][x_cord - 1] = 'n'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, 3, value))
-
-def move_rook_black(state, list, x_cord, y_cord):
-    friendly_set = set({'p', 'n', 'r', 'b', 'q', 'k'})
-    enemy_set = set({'P', 'N', 'R', 'B', 'Q', 'K'})
+    if(y_cord + 2 < BOARD_SIZE and x_cord - 1 >= 0):
+        to_index = (y_cord + 2) * 8 + x_cord - 1
+        if(squares[to_index] not in friendly_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        3 << DISTANCE_SHIFT)
+
+def move_rook_black(state, list, x_cord, y_cord, captures_only=False):
+    squares = state.squares
+    move_bits = (y_cord * 8 + x_cord) << FROM_SHIFT | ord('r') << PIECE_SHIFT
+    friendly_set = BLACK_PIECES
+    enemy_set = WHITE_PIECES
 
     # Move up direction
     move_counter = 0
     for y in range(y_cord-1, -1, -1):
         move_counter = move_counter + 1
+        to_index = y * 8 + x_cord
 
-        if(state[y][x_cord] in friendly_set):
+        if(squares[to_index] in friendly_set):
             break
 
-        if(state[y][x_cord] in enemy_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y][x_cord]]
-            newBoard[y][x_cord] = 'r'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, move_counter, value))
+        if(squares[to_index] in enemy_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        move_counter << DISTANCE_SHIFT)
             break
 
-        if state[y][x_cord] == '_':
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y][x_cord]]
-            newBoard[y][x_cord] = 'r'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, move_counter, value))
+        if squares[to_index] == EMPTY and not captures_only:
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        move_counter << DISTANCE_SHIFT)
 
     # Move down direction
     move_counter = 0
-    for y in range(y_cord+1, len(state), 1):
+    for y in range(y_cord+1, BOARD_SIZE, 1):
         move_counter = move_counter + 1
+        to_index = y * 8 + x_cord
 
-        if(state[y][x_cord] in friendly_set):
+        if(squares[to_index] in friendly_set):
             break
 
-        if(state[y][x_cord] in enemy_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y][x_cord]]
-            newBoard[y][x_cord] = 'r'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, move_counter, value))
+        if(squares[to_index] in enemy_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        move_counter << DISTANCE_SHIFT)
             break
 
-        if state[y][x_cord] == '_':
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y][x_cord]]
-            newBoard[y][x_cord] = 'r'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, move_counter, value))
+        if squares[to_index] == EMPTY and not captures_only:
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        move_counter << DISTANCE_SHIFT)
 
     # Move left direction
     move_counter = 0
     for x in range(x_cord-1, -1, -1):
         move_counter = move_counter + 1
+        to_index = y_cord * 8 + x
 
-        if(state[y_cord][x] in friendly_set):
+        if(squares[to_index] in friendly_set):
             break
 
-        if(state[y_cord][x] in enemy_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord][x]]
-            newBoard[y_cord][x] = 'r'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, move_counter, value))
+        if(squares[to_index] in enemy_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        move_counter << DISTANCE_SHIFT)
             break
 
-        if state[y_cord][x] == '_':
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord][x]]
-            newBoard[y_cord][x] = 'r'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, move_counter, value))
+        if squares[to_index] == EMPTY and not captures_only:
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        move_counter << DISTANCE_SHIFT)
 
     # Move right direction
     move_counter = 0
-    for x in range(x_cord+1, len(state), 1):
+    for x in range(x_cord+1, BOARD_SIZE, 1):
         move_counter = move_counter + 1
-        if(state[y_cord][x] in friendly_set):
+        to_index = y_cord * 8 + x
+        if(squares[to_index] in friendly_set):
             break
 
-        if(state[y_cord][x] in enemy_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord][x]]
-            newBoard[y_cord][x] = 'r'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, move_counter, value))
+        if(squares[to_index] in enemy_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        move_counter << DISTANCE_SHIFT)
             break
 
-        if state[y_cord][x] == '_':
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord][x]]
-            newBoard[y_cord][x] = 'r'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, move_counter, value))
+        if squares[to_index] == EMPTY and not captures_only:
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        move_counter << DISTANCE_SHIFT)
 
-def move_bishop_black(state, list, x_cord, y_cord):
-    friendly_set = set({'p', 'n', 'r', 'b', 'q', 'k'})
-    enemy_set = set({'P', 'N', 'R', 'B', 'Q', 'K'})
+def move_bishop_black(state, list, x_cord, y_cord, captures_only=False):
+    squares = state.squares
+    move_bits = (y_cord * 8 + x_cord) << FROM_SHIFT | ord('b') << PIECE_SHIFT
+    friendly_set = BLACK_PIECES
+    enemy_set = WHITE_PIECES
     inBounds = True
 
     # Move up-left direction
@@ -1112,27 +1442,22 @@ def move_bishop_black(state, list, x_cord, y_cord):
     x = x_cord
     move_counter = 0
     while(inBounds):
-        if(y - 1 >= 0 and x + 1 < len(state)):
+        if(y - 1 >= 0 and x + 1 < BOARD_SIZE):
             y = y - 1
             x = x + 1
             move_counter = move_counter + 1
-            if(state[y][x] in friendly_set):
+            to_index = y * 8 + x
+            if(squares[to_index] in friendly_set):
                 break
 
-            if(state[y][x] in enemy_set):
-                newBoard = copy.deepcopy(state)
-                value = piece_values[newBoard[y][x]]
-                newBoard[y][x] = 'b'
-                newBoard[y_cord][x_cord] = '_'
-                list.append((newBoard, move_counter, value))
+            if(squares[to_index] in enemy_set):
+                list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                            move_counter << DISTANCE_SHIFT)
                 break
 
-            if state[y][x] == '_':
-                newBoard = copy.deepcopy(state)
-                value = piece_values[newBoard[y][x]]
-                newBoard[y][x] = 'b'
-                newBoard[y_cord][x_cord] = '_'
-                list.append((newBoard, move_counter, value))
+            if squares[to_index] == EMPTY and not captures_only:
+                list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                            move_counter << DISTANCE_SHIFT)
         else:
             inBounds = False
 
@@ -1146,23 +1471,18 @@ def move_bishop_black(state, list, x_cord, y_cord):
             y = y - 1
             x = x - 1
             move_counter = move_counter + 1
-            if(state[y][x] in friendly_set):
+            to_index = y * 8 + x
+            if(squares[to_index] in friendly_set):
                 break
 
-            if(state[y][x] in enemy_set):
-                newBoard = copy.deepcopy(state)
-                value = piece_values[newBoard[y][x]]
-                newBoard[y][x] = 'b'
-                newBoard[y_cord][x_cord] = '_'
-                list.append((newBoard, move_counter, value))
+            if(squares[to_index] in enemy_set):
+                list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                            move_counter << DISTANCE_SHIFT)
                 break
 
-            if state[y][x] == '_':
-                newBoard = copy.deepcopy(state)
-                value = piece_values[newBoard[y][x]]
-                newBoard[y][x] = 'b'
-                newBoard[y_cord][x_cord] = '_'
-                list.append((newBoard, move_counter, value))
+            if squares[to_index] == EMPTY and not captures_only:
+                list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                            move_counter << DISTANCE_SHIFT)
         else:
             inBounds = False
 
@@ -1172,27 +1492,22 @@ def move_bishop_black(state, list, x_cord, y_cord):
     x = x_cord
     move_counter = 0
     while(inBounds):
-        if(y + 1 < len(state) and x - 1 >= 0):
+        if(y + 1 < BOARD_SIZE and x - 1 >= 0):
             y = y + 1
             x = x - 1
             move_counter = move_counter + 1
-            if(state[y][x] in friendly_set):
+            to_index = y * 8 + x
+            if(squares[to_index] in friendly_set):
                 break
 
-            if(state[y][x] in enemy_set):
-                newBoard = copy.deepcopy(state)
-                value = piece_values[newBoard[y][x]]
-                newBoard[y][x] = 'b'
-                newBoard[y_cord][x_cord] = '_'
-                list.append((newBoard, move_counter, value))
+            if(squares[to_index] in enemy_set):
+                list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                            move_counter << DISTANCE_SHIFT)
                 break
 
-            if state[y][x] == '_':
-                newBoard = copy.deepcopy(state)
-                value = piece_values[newBoard[y][x]]
-                newBoard[y][x] = 'b'
-                newBoard[y_cord][x_cord] = '_'
-                list.append((newBoard, move_counter, value))
+            if squares[to_index] == EMPTY and not captures_only:
+                list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                            move_counter << DISTANCE_SHIFT)
         else:
             inBounds = False
 
@@ -1202,33 +1517,30 @@ def move_bishop_black(state, list, x_cord, y_cord):
     x = x_cord
     move_counter = 0
     while(inBounds):
-        if(y + 1 < len(state) and x + 1 < len(state)):
+        if(y + 1 < BOARD_SIZE and x + 1 < BOARD_SIZE):
             y = y + 1
             x = x + 1
             move_counter = move_counter + 1
-            if(state[y][x] in friendly_set):
+            to_index = y * 8 + x
+            if(squares[to_index] in friendly_set):
                 break
 
-            if(state[y][x] in enemy_set):
-                newBoard = copy.deepcopy(state)
-                value = piece_values[newBoard[y][x]]
-                newBoard[y][x] = 'b'
-                newBoard[y_cord][x_cord] = '_'
-                list.append((newBoard, move_counter, value))
+            if(squares[to_index] in enemy_set):
+                list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                            move_counter << DISTANCE_SHIFT)
                 break
 
-            if state[y][x] == '_':
-                newBoard = copy.deepcopy(state)
-                value = piece_values[newBoard[y][x]]
-                newBoard[y][x] = 'b'
-                newBoard[y_cord][x_cord] = '_'
-                list.append((newBoard, move_counter, value))
+            if squares[to_index] == EMPTY and not captures_only:
+                list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                            move_counter << DISTANCE_SHIFT)
         else:
             inBounds = False
 
-def move_queen_black(state, list, x_cord, y_cord):
-    friendly_set = set({'p', 'n', 'r', 'b', 'q', 'k'})
-    enemy_set = set({'P', 'N', 'R', 'B', 'Q', 'K'})
+def move_queen_black(state, list, x_cord, y_cord, captures_only=False):
+    squares = state.squares
+    move_bits = (y_cord * 8 + x_cord) << FROM_SHIFT | ord('q') << PIECE_SHIFT
+    friendly_set = BLACK_PIECES
+    enemy_set = WHITE_PIECES
     inBounds = True
 
     # Move up-left direction
@@ -1236,27 +1548,22 @@ def move_queen_black(state, list, x_cord, y_cord):
     x = x_cord
     move_counter = 0
     while(inBounds):
-        if(y - 1 >= 0 and x + 1 < len(state[0])):
+        if(y - 1 >= 0 and x + 1 < BOARD_SIZE):
             y = y - 1
             x = x + 1
             move_counter = move_counter + 1
-            if(state[y][x] in friendly_set):
+            to_index = y * 8 + x
+            if(squares[to_index] in friendly_set):
                 break
 
-            if(state[y][x] in enemy_set):
-                newBoard = copy.deepcopy(state)
-                value = piece_values[newBoard[y][x]]
-                newBoard[y][x] = 'q'
-                newBoard[y_cord][x_cord] = '_'
-                list.append((newBoard, move_counter, value))
+            if(squares[to_index] in enemy_set):
+                list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                            move_counter << DISTANCE_SHIFT)
                 break
 
-            if state[y][x] == '_':
-                newBoard = copy.deepcopy(state)
-                value = piece_values[newBoard[y][x]]
-                newBoard[y][x] = 'q'
-                newBoard[y_cord][x_cord] = '_'
-                list.append((newBoard, move_counter, value))
+            if squares[to_index] == EMPTY and not captures_only:
+                list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                            move_counter << DISTANCE_SHIFT)
         else:
             inBounds = False
 
@@ -1270,23 +1577,18 @@ def move_queen_black(state, list, x_cord, y_cord):
             y = y - 1
             x = x - 1
             move_counter = move_counter + 1
-            if(state[y][x] in friendly_set):
+            to_index = y * 8 + x
+            if(squares[to_index] in friendly_set):
                 break
 
-            if(state[y][x] in enemy_set):
-                newBoard = copy.deepcopy(state)
-                value = piece_values[newBoard[y][x]]
-                newBoard[y][x] = 'q'
-                newBoard[y_cord][x_cord] = '_'
-                list.append((newBoard, move_counter, value))
+            if(squares[to_index] in enemy_set):
+                list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                            move_counter << DISTANCE_SHIFT)
                 break
 
-            if state[y][x] == '_':
-                newBoard = copy.deepcopy(state)
-                value = piece_values[newBoard[y][x]]
-                newBoard[y][x] = 'q'
-                newBoard[y_cord][x_cord] = '_'
-                list.append((newBoard, move_counter, value))
+            if squares[to_index] == EMPTY and not captures_only:
+                list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                            move_counter << DISTANCE_SHIFT)
         else:
             inBounds = False
 
@@ -1296,27 +1598,22 @@ def move_queen_black(state, list, x_cord, y_cord):
     x = x_cord
     move_counter = 0
     while(inBounds):
-        if(y + 1 < len(state) and x - 1 >= 0):
+        if(y + 1 < BOARD_SIZE and x - 1 >= 0):
             y = y + 1
             x = x - 1
             move_counter = move_counter + 1
-            if(state[y][x] in friendly_set):
+            to_index = y * 8 + x
+            if(squares[to_index] in friendly_set):
                 break
 
-            if(state[y][x] in enemy_set):
-                newBoard = copy.deepcopy(state)
-                value = piece_values[newBoard[y][x]]
-                newBoard[y][x] = 'q'
-                newBoard[y_cord][x_cord] = '_'
-                list.append((newBoard, move_counter, value))
+            if(squares[to_index] in enemy_set):
+                list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                            move_counter << DISTANCE_SHIFT)
                 break
 
-            if state[y][x] == '_':
-                newBoard = copy.deepcopy(state)
-                value = piece_values[newBoard[y][x]]
-                newBoard[y][x] = 'q'
-                newBoard[y_cord][x_cord] = '_'
-                list.append((newBoard, move_counter, value))
+            if squares[to_index] == EMPTY and not captures_only:
+                list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                            move_counter << DISTANCE_SHIFT)
         else:
             inBounds = False
 
@@ -1326,27 +1623,22 @@ def move_queen_black(state, list, x_cord, y_cord):
     x = x_cord
     move_counter = 0
     while(inBounds):
-        if(y + 1 < len(state) and x + 1 < len(state[0])):
+        if(y + 1 < BOARD_SIZE and x + 1 < BOARD_SIZE):
             y = y + 1
             x = x + 1
             move_counter = move_counter + 1
-            if(state[y][x] in friendly_set):
+            to_index = y * 8 + x
+            if(squares[to_index] in friendly_set):
                 break
 
-            if(state[y][x] in enemy_set):
-                newBoard = copy.deepcopy(state)
-                value = piece_values[newBoard[y][x]]
-                newBoard[y][x] = 'q'
-                newBoard[y_cord][x_cord] = '_'
-                list.append((newBoard, move_counter, value))
+            if(squares[to_index] in enemy_set):
+                list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                            move_counter << DISTANCE_SHIFT)
                 break
 
-            if state[y][x] == '_':
-                newBoard = copy.deepcopy(state)
-                value = piece_values[newBoard[y][x]]
-                newBoard[y][x] = 'q'
-                newBoard[y_cord][x_cord] = '_'
-                list.append((newBoard, move_counter, value))
+            if squares[to_index] == EMPTY and not captures_only:
+                list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                            move_counter << DISTANCE_SHIFT)
         else:
             inBounds = False
 
@@ -1354,176 +1646,918 @@ def move_queen_black(state, list, x_cord, y_cord):
     move_counter = 0
     for y in range(y_cord-1, -1, -1):
         move_counter = move_counter + 1
+        to_index = y * 8 + x_cord
 
-        if(state[y][x_cord] in friendly_set):
+        if(squares[to_index] in friendly_set):
             break
 
-        if(state[y][x_cord] in enemy_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y][x_cord]]
-            newBoard[y][x_cord] = 'q'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, move_counter, value))
+        if(squares[to_index] in enemy_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        move_counter << DISTANCE_SHIFT)
             break
 
-        if state[y][x_cord] == '_':
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y][x_cord]]
-            newBoard[y][x_cord] = 'q'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, move_counter, value))
+        if squares[to_index] == EMPTY and not captures_only:
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        move_counter << DISTANCE_SHIFT)
 
     # Move down direction
     move_counter = 0
-    for y in range(y_cord+1, len(state), 1):
+    for y in range(y_cord+1, BOARD_SIZE, 1):
         move_counter = move_counter + 1
+        to_index = y * 8 + x_cord
 
-        if(state[y][x_cord] in friendly_set):
+        if(squares[to_index] in friendly_set):
             break
 
-        if(state[y][x_cord] in enemy_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y][x_cord]]
-            newBoard[y][x_cord] = 'q'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, move_counter, value))
+        if(squares[to_index] in enemy_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        move_counter << DISTANCE_SHIFT)
             break
 
-        if state[y][x_cord] == '_':
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y][x_cord]]
-            newBoard[y][x_cord] = 'q'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, move_counter, value))
+        if squares[to_index] == EMPTY and not captures_only:
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        move_counter << DISTANCE_SHIFT)
 
     # Move left direction
     move_counter = 0
     for x in range(x_cord-1, -1, -1):
         move_counter = move_counter + 1
+        to_index = y_cord * 8 + x
 
-        if(state[y_cord][x] in friendly_set):
+        if(squares[to_index] in friendly_set):
             break
 
-        if(state[y_cord][x] in enemy_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord][x]]
-            newBoard[y_cord][x] = 'q'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, move_counter, value))
+        if(squares[to_index] in enemy_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        move_counter << DISTANCE_SHIFT)
             break
 
-        if state[y_cord][x] == '_':
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord][x]]
-            newBoard[y_cord][x] = 'q'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, move_counter, value))
+        if squares[to_index] == EMPTY and not captures_only:
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        move_counter << DISTANCE_SHIFT)
 
     # Move right direction
     move_counter = 0
-    for x in range(x_cord+1, len(state), 1):
+    for x in range(x_cord+1, BOARD_SIZE, 1):
         move_counter = move_counter + 1
+        to_index = y_cord * 8 + x
 
-        if(state[y_cord][x] in friendly_set):
+        if(squares[to_index] in friendly_set):
             break
 
-        if(state[y_cord][x] in enemy_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord][x]]
-            newBoard[y_cord][x] = 'q'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, move_counter, value))
+        if(squares[to_index] in enemy_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        move_counter << DISTANCE_SHIFT)
             break
 
-        if state[y_cord][x] == '_':
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord][x]]
-            newBoard[y_cord][x] = 'q'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, move_counter, value))
+        if squares[to_index] == EMPTY and not captures_only:
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        move_counter << DISTANCE_SHIFT)
 
-def move_king_black(state, list, x_cord, y_cord):
-    friendly_set = set({'p', 'n', 'r', 'b', 'q', 'k'})
-    enemy_set = set({'P', 'N', 'R', 'B', 'Q', 'K'})
+def move_king_black(state, list, x_cord, y_cord, captures_only=False):
+    squares = state.squares
+    move_bits = (y_cord * 8 + x_cord) << FROM_SHIFT | ord('k') << PIECE_SHIFT
+    friendly_set = BLACK_PIECES
+    if captures_only:
+        friendly_set = BLACK_PIECES_OR_EMPTY    # squares it may not move to
+    enemy_set = WHITE_PIECES
 
     # Move up-left direction
-    if(y_cord - 1 >= 0 and x_cord + 1 < len(state)):
-        if(state[y_cord - 1][x_cord + 1] not in friendly_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord - 1][x_cord + 1]]
-            newBoard[y_cord - 1][x_cord + 1] = 'k'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, 1, value))
+    if(y_cord - 1 >= 0 and x_cord + 1 < BOARD_SIZE):
+        to_index = (y_cord - 1) * 8 + x_cord + 1
+        if(squares[to_index] not in friendly_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        1 << DISTANCE_SHIFT)
 
 
     # Move up-right direction
     if(y_cord - 1 >= 0 and x_cord - 1 >= 0):
-        if(state[y_cord - 1][x_cord - 1] not in friendly_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord - 1][x_cord - 1]]
-            newBoard[y_cord - 1][x_cord - 1] = 'k'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, 1, value))
+        to_index = (y_cord - 1) * 8 + x_cord - 1
+        if(squares[to_index] not in friendly_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        1 << DISTANCE_SHIFT)
 
 
     # Move down-left direction
-    if(y_cord + 1 < len(state) and x_cord - 1 >= 0):
-        if(state[y_cord + 1][x_cord - 1] not in friendly_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord + 1][x_cord - 1]]
-            newBoard[y_cord + 1][x_cord - 1] = 'k'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, 1, value))
+    if(y_cord + 1 < BOARD_SIZE and x_cord - 1 >= 0):
+        to_index = (y_cord + 1) * 8 + x_cord - 1
+        if(squares[to_index] not in friendly_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        1 << DISTANCE_SHIFT)
 
 
     # Move down-right direction
-    if(y_cord + 1 < len(state) and x_cord + 1 < len(state)):
-        if(state[y_cord + 1][x_cord + 1] not in friendly_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord + 1][x_cord + 1]]
-            newBoard[y_cord + 1][x_cord + 1] = 'k'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, 1, value))
+    if(y_cord + 1 < BOARD_SIZE and x_cord + 1 < BOARD_SIZE):
+        to_index = (y_cord + 1) * 8 + x_cord + 1
+        if(squares[to_index] not in friendly_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        1 << DISTANCE_SHIFT)
 
 
     # Move up direction
     if(y_cord - 1 >= 0):
-        if(state[y_cord - 1][x_cord] not in friendly_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord - 1][x_cord]]
-            newBoard[y_cord - 1][x_cord] = 'k'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, 1, value))
+        to_index = (y_cord - 1) * 8 + x_cord
+        if(squares[to_index] not in friendly_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        1 << DISTANCE_SHIFT)
 
 
     # Move down direction
-    if(y_cord + 1 < len(state)):
-        if(state[y_cord + 1][x_cord] not in friendly_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord + 1][x_cord]]
-            newBoard[y_cord + 1][x_cord] = 'k'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, 1, value))
+    if(y_cord + 1 < BOARD_SIZE):
+        to_index = (y_cord + 1) * 8 + x_cord
+        if(squares[to_index] not in friendly_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        1 << DISTANCE_SHIFT)
 
 
     # Move left direction
     if(x_cord - 1 >= 0):
-        if(state[y_cord][x_cord - 1] not in friendly_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord][x_cord - 1]]
-            newBoard[y_cord][x_cord - 1] = 'k'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, 1, value))
+        to_index = y_cord * 8 + x_cord - 1
+        if(squares[to_index] not in friendly_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        1 << DISTANCE_SHIFT)
 
 
     # Move right direction
-    if(x_cord + 1 < len(state)):
-        if(state[y_cord][x_cord + 1] not in friendly_set):
-            newBoard = copy.deepcopy(state)
-            value = piece_values[newBoard[y_cord][x_cord + 1]]
-            newBoard[y_cord][x_cord + 1] = 'k'
-            newBoard[y_cord][x_cord] = '_'
-            list.append((newBoard, 1, value))
+    if(x_cord + 1 < BOARD_SIZE):
+        to_index = y_cord * 8 + x_cord + 1
+        if(squares[to_index] not in friendly_set):
+            list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                        1 << DISTANCE_SHIFT)
+
+# move_* function for each of player's pieces
+PIECE_MOVERS = {
+    "WHITE": {
+        'P': move_pawn_white,
+        'N': move_knight_white,
+        'R': move_rook_white,
+        'B': move_bishop_white,
+        'Q': move_queen_white,
+        'K': move_king_white
+    },
+    "BLACK": {
+        'p': move_pawn_black,
+        'n': move_knight_black,
+        'r': move_rook_black,
+        'b': move_bishop_black,
+        'q': move_queen_black,
+        'k': move_king_black
+    }
+}
+
+class UnrolledPosition(Position):
+    def generate_moves(self, player):
+        return generate_moves_unrolled(self, player)
+
+    def generate_captures(self, player):
+        return generate_moves_unrolled(self, player, True)
+
+    # The move_* functions have no quiet-only mode, so the captures are
+    # generated and dropped again
+    def generate_quiets(self, player):
+        return [move for move in generate_moves_unrolled(self, player)
+                if move >> CAPTURED_SHIFT & PIECE_MASK == EMPTY]
+
+    def piece_moves(self, index, player, captures):
+        moves = []
+        row, col = divmod(index, BOARD_SIZE)
+        PIECE_MOVERS[player][chr(self.squares[index])](self, moves, col, row, captures)
+        if not captures:
+            moves = [move for move in moves if move >> CAPTURED_SHIFT & PIECE_MASK == EMPTY]
+        return moves
+
+################################################################################
+#  Bitboard move generation
+# ------------------------------------------------------------------------------
+#  Alternative to generating square by square. BitboardPosition keeps one
+#  64-bit integer per piece byte (bit index = square index) alongside the
+#  squares, updated on make/unmake. Knight, king and pawn moves come from
+#  precomputed attack tables; rook and bishop attacks are looked up by the
+#  blocker bits on their rays. Magic bitboards would map those bits to a list
+#  index with ((occupancy * magic) & ALL_SQUARES) >> shift, which works in
+#  Python too, but the per-square tables here are dicts keyed by the masked
+#  occupancy instead: there is no magic number search, and one dict lookup is
+#  cheaper in Python than the multiply, mask, shift and list index.
+ALL_SQUARES = (1 << 64) - 1
+
+KNIGHT_OFFSETS = ((-1, -2), (-1, 2), (-2, -1), (-2, 1), (1, 2), (1, -2), (2, 1), (2, -1))
+KING_OFFSETS = ((-1, 1), (-1, -1), (1, -1), (1, 1), (-1, 0), (1, 0), (0, -1), (0, 1))
+ROOK_DIRECTIONS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+BISHOP_DIRECTIONS = ((-1, -1), (-1, 1), (1, -1), (1, 1))
+
+def jump_attacks(index, offsets):
+    row, col = divmod(index, BOARD_SIZE)
+    attacks = 0
+    for row_step, col_step in offsets:
+        if 0 <= row + row_step < BOARD_SIZE and 0 <= col + col_step < BOARD_SIZE:
+            attacks |= 1 << ((row + row_step) * 8 + col + col_step)
+    return attacks
+
+def slider_attacks(index, occupied, directions):
+    row, col = divmod(index, BOARD_SIZE)
+    attacks = 0
+    for row_step, col_step in directions:
+        y, x = row + row_step, col + col_step
+        while 0 <= y < BOARD_SIZE and 0 <= x < BOARD_SIZE:
+            bit = 1 << (y * 8 + x)
+            attacks |= bit
+            if occupied & bit:
+                break
+            y, x = y + row_step, x + col_step
+    return attacks
+
+# Squares whose occupancy can block a slider (the last square of each ray
+# never blocks anything further along it)
+def slider_mask(index, directions):
+    row, col = divmod(index, BOARD_SIZE)
+    mask = 0
+    for row_step, col_step in directions:
+        y, x = row + row_step, col + col_step
+        while 0 <= y + row_step < BOARD_SIZE and 0 <= x + col_step < BOARD_SIZE:
+            mask |= 1 << (y * 8 + x)
+            y, x = y + row_step, x + col_step
+    return mask
+
+# Attacks for every subset of the mask, enumerated with the carry-rippler trick
+def slider_table(index, mask, directions):
+    table = {}
+    subset = 0
+    while True:
+        table[subset] = slider_attacks(index, subset, directions)
+        subset = (subset - mask) & mask
+        if subset == 0:
+            return table
+
+KNIGHT_ATTACKS = [jump_attacks(index, KNIGHT_OFFSETS) for index in range(64)]
+KING_ATTACKS = [jump_attacks(index, KING_OFFSETS) for index in range(64)]
+WHITE_PAWN_ATTACKS = [jump_attacks(index, ((-1, -1), (-1, 1))) for index in range(64)]
+BLACK_PAWN_ATTACKS = [jump_attacks(index, ((1, -1), (1, 1))) for index in range(64)]
+
+# Chebyshev distance, i.e. the number of steps a slider or king takes
+DISTANCE = [[max(abs(a // 8 - b // 8), abs(a % 8 - b % 8)) for b in range(64)]
+            for a in range(64)]
+
+ROOK_MASKS = [slider_mask(index, ROOK_DIRECTIONS) for index in range(64)]
+BISHOP_MASKS = [slider_mask(index, BISHOP_DIRECTIONS) for index in range(64)]
+
+# The slider tables hold ~107k entries, so they are only built (in about a
+# third of a second) the first time a BitboardPosition is created
+ROOK_TABLES = []
+BISHOP_TABLES = []
+
+def init_slider_tables():
+    if not ROOK_TABLES:
+        ROOK_TABLES.extend(slider_table(index, ROOK_MASKS[index], ROOK_DIRECTIONS)
+                           for index in range(64))
+        BISHOP_TABLES.extend(slider_table(index, BISHOP_MASKS[index], BISHOP_DIRECTIONS)
+                             for index in range(64))
+
+def rook_attacks(index, occupied):
+    return ROOK_TABLES[index][occupied & ROOK_MASKS[index]]
+
+def bishop_attacks(index, occupied):
+    return BISHOP_TABLES[index][occupied & BISHOP_MASKS[index]]
+
+class BitboardPosition(Position):
+    def __init__(self, board, player="WHITE"):
+        super().__init__(board, player)
+        init_slider_tables()
+        self.bitboards = [0] * 128    # indexed by piece byte, EMPTY included
+        for index, piece in enumerate(self.squares):
+            self.bitboards[piece] |= 1 << index
+
+    def make_move(self, move):
+        from_index = move >> FROM_SHIFT & SQUARE_MASK
+        from_bit = 1 << from_index
+        to_bit = 1 << (move & SQUARE_MASK)
+        bitboards = self.bitboards
+        moved = self.squares[from_index]
+        bitboards[moved] ^= from_bit
+        bitboards[EMPTY] ^= from_bit
+        bitboards[move >> CAPTURED_SHIFT & PIECE_MASK] ^= to_bit
+        bitboards[move >> PIECE_SHIFT & PIECE_MASK] ^= to_bit
+        super().make_move(move)
+
+    def unmake_move(self):
+        move, moved, key = self.undo_stack[-1]
+        from_bit = 1 << (move >> FROM_SHIFT & SQUARE_MASK)
+        to_bit = 1 << (move & SQUARE_MASK)
+        bitboards = self.bitboards
+        bitboards[moved] ^= from_bit
+        bitboards[EMPTY] ^= from_bit
+        bitboards[move >> CAPTURED_SHIFT & PIECE_MASK] ^= to_bit
+        bitboards[move >> PIECE_SHIFT & PIECE_MASK] ^= to_bit
+        super().unmake_move()
+
+    def is_attacked(self, index, by_player):
+        pawn, knight, bishop, rook, queen, king = ATTACKING_PIECES[by_player]
+        bitboards = self.bitboards
+        occupied = ALL_SQUARES ^ bitboards[EMPTY]
+        return bool(PAWN_ATTACKER_MASKS[by_player][index] & bitboards[pawn] or
+                    KNIGHT_ATTACKS[index] & bitboards[knight] or
+                    KING_ATTACKS[index] & bitboards[king] or
+                    rook_attacks(index, occupied) & (bitboards[rook] | bitboards[queen]) or
+                    bishop_attacks(index, occupied) & (bitboards[bishop] | bitboards[queen]))
+
+    def generate_moves(self, player):
+        return generate_moves_bitboard(self, player)
+
+    def generate_captures(self, player):
+        return generate_moves_bitboard(self, player, True)
+
+    def generate_quiets(self, player):
+        return generate_moves_bitboard(self, player, quiets_only=True)
+
+    def piece_moves(self, index, player, captures):
+        bitboards = self.bitboards
+        squares = self.squares
+        piece = chr(squares[index])
+        empty = bitboards[EMPTY]
+        occupied = ALL_SQUARES ^ empty
+        targets = occupied ^ self.pieces[player] if captures else empty
+        moves = []
+        kind = piece.upper()
+        if kind == 'P':
+            if captures:
+                pawn_attacks = WHITE_PAWN_ATTACKS if player == "WHITE" else BLACK_PAWN_ATTACKS
+                add_bitboard_moves(moves, squares, index, pawn_attacks[index] & targets, piece, 1)
+            else:
+                to_index = index + (-8 if player == "WHITE" else 8)
+                if 0 <= to_index < 64 and empty >> to_index & 1:
+                    moves.append(encode_move(index, to_index, ord(piece), EMPTY, 1))
+        elif kind == 'N':
+            add_bitboard_moves(moves, squares, index, KNIGHT_ATTACKS[index] & targets, piece, 3)
+        elif kind == 'K':
+            add_bitboard_moves(moves, squares, index, KING_ATTACKS[index] & targets, piece, 1)
+        else:
+            attacks = 0
+            if kind != 'B':
+                attacks |= rook_attacks(index, occupied)
+            if kind != 'R':
+                attacks |= bishop_attacks(index, occupied)
+            add_bitboard_moves(moves, squares, index, attacks & targets, piece)
+        return moves
+
+# Appends a move from index to every square set in targets
+def add_bitboard_moves(list, squares, index, targets, piece, distance=None):
+    move_bits = index << FROM_SHIFT | ord(piece) << PIECE_SHIFT
+    while targets:
+        bit = targets & -targets
+        targets ^= bit
+        to_index = bit.bit_length() - 1
+        list.append(move_bits | to_index | squares[to_index] << CAPTURED_SHIFT |
+                    (distance or DISTANCE[index][to_index]) << DISTANCE_SHIFT)
+
+def generate_moves_bitboard(position, player, captures_only=False, quiets_only=False):
+    bitboards = position.bitboards
+    squares = position.squares
+    if player == "WHITE":
+        pawn, knight, bishop, rook, queen, king = 'PNBRQK'
+        pawn_attacks = WHITE_PAWN_ATTACKS
+        pawn_step = -8
+    else:
+        pawn, knight, bishop, rook, queen, king = 'pnbrqk'
+        pawn_attacks = BLACK_PAWN_ATTACKS
+        pawn_step = 8
+
+    empty = bitboards[EMPTY]
+    occupied = ALL_SQUARES ^ empty
+    own = position.pieces[player]
+    enemy = occupied ^ own
+    not_own = ALL_SQUARES ^ own    # target squares
+    if captures_only:
+        not_own = enemy
+    elif quiets_only:
+        not_own = empty
+        enemy = 0
+    moves = []
+
+    pieces = bitboards[ord(pawn)]
+    while pieces:
+        bit = pieces & -pieces
+        pieces ^= bit
+        index = bit.bit_length() - 1
+        to_index = index + pawn_step
+        if not captures_only and 0 <= to_index < 64 and empty >> to_index & 1:
+            moves.append(encode_move(index, to_index, ord(pawn), EMPTY, 1))
+        add_bitboard_moves(moves, squares, index, pawn_attacks[index] & enemy, pawn, 1)
+
+    for piece, table, distance in ((knight, KNIGHT_ATTACKS, 3), (king, KING_ATTACKS, 1)):
+        pieces = bitboards[ord(piece)]
+        while pieces:
+            bit = pieces & -pieces
+            pieces ^= bit
+            index = bit.bit_length() - 1
+            add_bitboard_moves(moves, squares, index, table[index] & not_own, piece, distance)
+
+    for piece in (rook, bishop, queen):
+        pieces = bitboards[ord(piece)]
+        while pieces:
+            bit = pieces & -pieces
+            pieces ^= bit
+            index = bit.bit_length() - 1
+            attacks = 0
+            if piece != bishop:
+                attacks |= rook_attacks(index, occupied)
+            if piece != rook:
+                attacks |= bishop_attacks(index, occupied)
+            add_bitboard_moves(moves, squares, index, attacks & not_own, piece)
+
+    return moves
+
+################################################################################
+#  Attack detection and legal moves
+# ------------------------------------------------------------------------------
+#  A square is attacked if a piece of the attacking side stands where a
+#  piece of its kind on the square could capture it: knight and king jumps
+#  and pawn captures are looked up in reverse, and the rook and bishop rays
+#  are walked to the first occupied square. The move generators produce
+#  moves that may leave the mover's king attacked; the search makes each
+#  one and drops it if it does. A side with no legal move is checkmated if
+#  in check and stalemated otherwise.
+ATTACKING_PIECES = {"WHITE": tuple(b'PNBRQK'), "BLACK": tuple(b'pnbrqk')}
+KINGS = {"WHITE": ord('K'), "BLACK": ord('k')}
+OPPONENTS = {"WHITE": "BLACK", "BLACK": "WHITE"}
+
+# A white pawn attacks a square from the squares a black pawn on it would
+# attack, and the other way round
+PAWN_ATTACKER_MASKS = {"WHITE": BLACK_PAWN_ATTACKS, "BLACK": WHITE_PAWN_ATTACKS}
+
+def square_indices(bitboard):
+    indices = []
+    while bitboard:
+        bit = bitboard & -bitboard
+        bitboard ^= bit
+        indices.append(bit.bit_length() - 1)
+    return indices
+
+# Squares outward from index along each direction, nearest first
+def ray_squares(index, directions):
+    row, col = divmod(index, BOARD_SIZE)
+    rays = []
+    for row_step, col_step in directions:
+        ray = []
+        y, x = row + row_step, col + col_step
+        while 0 <= y < BOARD_SIZE and 0 <= x < BOARD_SIZE:
+            ray.append(y * 8 + x)
+            y, x = y + row_step, x + col_step
+        if ray:
+            rays.append(ray)
+    return rays
+
+KNIGHT_SQUARES = [square_indices(KNIGHT_ATTACKS[index]) for index in range(64)]
+KING_SQUARES = [square_indices(KING_ATTACKS[index]) for index in range(64)]
+PAWN_ATTACKER_SQUARES = {player: [square_indices(masks[index]) for index in range(64)]
+                         for player, masks in PAWN_ATTACKER_MASKS.items()}
+ROOK_RAYS = [ray_squares(index, ROOK_DIRECTIONS) for index in range(64)]
+BISHOP_RAYS = [ray_squares(index, BISHOP_DIRECTIONS) for index in range(64)]
+
+def square_attacked(squares, index, by_player):
+    pawn, knight, bishop, rook, queen, king = ATTACKING_PIECES[by_player]
+    for square in PAWN_ATTACKER_SQUARES[by_player][index]:
+        if squares[square] == pawn:
+            return True
+    for square in KNIGHT_SQUARES[index]:
+        if squares[square] == knight:
+            return True
+    for square in KING_SQUARES[index]:
+        if squares[square] == king:
+            return True
+    for ray in ROOK_RAYS[index]:
+        for square in ray:
+            piece = squares[square]
+            if piece != EMPTY:
+                if piece == rook or piece == queen:
+                    return True
+                break
+    for ray in BISHOP_RAYS[index]:
+        for square in ray:
+            piece = squares[square]
+            if piece != EMPTY:
+                if piece == bishop or piece == queen:
+                    return True
+                break
+    return False
+
+# A missing king counts as in check
+def in_check(position, player):
+    king_index = position.king_squares[player]
+    return king_index == -1 or position.is_attacked(king_index, OPPONENTS[player])
+
+################################################################################
+#  Table-driven move generation
+# ------------------------------------------------------------------------------
+#  Every piece's moves come from tables built once at import, for each piece
+#  byte and square: pawn pushes (to empty squares only), pawn captures (of
+#  enemy pieces only), knight and king jumps, and for the sliders each ray
+#  as its squares nearest first. Steps off the board are simply not in the
+#  tables, so a candidate move costs one look at its target square. Entries
+#  are (to_index, move) pairs with everything but the captured piece already
+#  packed into the move. Directions are in the order the move_* functions
+#  try them, so the moves come out in the same order as well.
+PAWN_PUSH_OFFSETS = {"WHITE": ((-1, 0),), "BLACK": ((1, 0),)}
+PAWN_CAPTURE_OFFSETS = {"WHITE": ((-1, 1), (-1, -1)), "BLACK": ((1, 1), (1, -1))}
+SLIDER_DIRECTIONS = {'R': ROOK_DIRECTIONS, 'B': KING_OFFSETS[:4], 'Q': KING_OFFSETS}
+ENEMY_PIECES = {"WHITE": BLACK_PIECES, "BLACK": WHITE_PIECES}
+QUIET_BITS = EMPTY << CAPTURED_SHIFT    # the captured field of a quiet move
+
+# One step from index in each direction that stays on the board
+def jump_entries(index, piece, offsets, distance):
+    return tuple((ray[0], encode_move(index, ray[0], piece, 0, distance))
+                 for ray in ray_squares(index, offsets))
+
+# (pawn pushes, pawn captures, jumps, rays) for piece on index
+def move_table_entry(piece, index):
+    side = PIECE_SIDES[piece]
+    kind = chr(piece).upper()
+    if kind == 'P':
+        return (jump_entries(index, piece, PAWN_PUSH_OFFSETS[side], 1),
+                jump_entries(index, piece, PAWN_CAPTURE_OFFSETS[side], 1), (), ())
+    if kind == 'N':
+        return (), (), jump_entries(index, piece, KNIGHT_OFFSETS, 3), ()
+    if kind == 'K':
+        return (), (), jump_entries(index, piece, KING_OFFSETS, 1), ()
+    rays = tuple(tuple((to_index, encode_move(index, to_index, piece, 0, distance))
+                       for distance, to_index in enumerate(ray, 1))
+                 for ray in ray_squares(index, SLIDER_DIRECTIONS[kind]))
+    return (), (), (), rays
+
+MOVE_TABLES = [None] * 128    # indexed by piece byte, then square
+for piece in WHITE_PIECES | BLACK_PIECES:
+    MOVE_TABLES[piece] = [move_table_entry(piece, index) for index in range(64)]
+
+# Appends the captures (if captures) and quiet moves (if quiets) of the piece
+# on index to list
+def add_table_moves(list, squares, index, enemies, captures=True, quiets=True):
+    pushes, pawn_captures, jumps, rays = MOVE_TABLES[squares[index]][index]
+    if quiets:
+        for to_index, move in pushes:
+            if squares[to_index] == EMPTY:
+                list.append(move | QUIET_BITS)
+    if captures:
+        for to_index, move in pawn_captures:
+            target = squares[to_index]
+            if target in enemies:
+                list.append(move | target << CAPTURED_SHIFT)
+    for to_index, move in jumps:
+        target = squares[to_index]
+        if target == EMPTY:
+            if quiets:
+                list.append(move | QUIET_BITS)
+        elif captures and target in enemies:
+            list.append(move | target << CAPTURED_SHIFT)
+    for ray in rays:
+        for to_index, move in ray:
+            target = squares[to_index]
+            if target == EMPTY:
+                if quiets:
+                    list.append(move | QUIET_BITS)
+            else:
+                if captures and target in enemies:
+                    list.append(move | target << CAPTURED_SHIFT)
+                break
+
+def generate_moves(state, player, captures_only=False, quiets_only=False):
+    squares = state.squares
+    enemies = ENEMY_PIECES[player]
+    captures, quiets = not quiets_only, not captures_only
+    moves = []
+
+    pieces = state.pieces[player]
+    while pieces:
+        bit = pieces & -pieces
+        pieces ^= bit
+        add_table_moves(moves, squares, bit.bit_length() - 1, enemies, captures, quiets)
+
+    return moves
+
+################################################################################
+#  10x12 mailbox move generation
+# ------------------------------------------------------------------------------
+#  MailboxPosition keeps a second copy of the board in 120 squares, ten
+#  columns by twelve rows, with the 8x8 board in the middle and OFF_BOARD on
+#  the two rows above and below it and the column either side. A king,
+#  knight or slider step from a board square lands either on the board or
+#  on that border (a knight's two columns sideways wrap into the column on
+#  the other side), so a step runs off the board exactly when its square
+#  holds OFF_BOARD: one lookup instead of comparing rows and columns. Steps
+#  are row * 10 + column offsets in the move_* functions' order. Moves still
+#  name their squares 0-63 (MAILBOX_SQUARES converts back), so the rest of
+#  the search sees no difference.
+OFF_BOARD = ord('#')
+MAILBOX_INDEX = [(index // 8 + 2) * 10 + index % 8 + 1 for index in range(64)]
+MAILBOX_SQUARES = [-1] * 120    # board square of each mailbox square
+for index, mailbox_index in enumerate(MAILBOX_INDEX):
+    MAILBOX_SQUARES[mailbox_index] = index
+
+def mailbox_steps(offsets):
+    return tuple(row_step * 10 + col_step for row_step, col_step in offsets)
+
+MAILBOX_KNIGHT_STEPS = mailbox_steps(KNIGHT_OFFSETS)
+MAILBOX_KING_STEPS = mailbox_steps(KING_OFFSETS)
+MAILBOX_ROOK_STEPS = mailbox_steps(ROOK_DIRECTIONS)
+MAILBOX_BISHOP_STEPS = mailbox_steps(BISHOP_DIRECTIONS)
+MAILBOX_PAWN_ATTACKER_STEPS = {"WHITE": mailbox_steps(PAWN_CAPTURE_OFFSETS["BLACK"]),
+                               "BLACK": mailbox_steps(PAWN_CAPTURE_OFFSETS["WHITE"])}
+
+# (pawn pushes, pawn captures, jumps, slides, distance of a pawn, knight or
+# king move) as mailbox steps, indexed by piece byte
+MAILBOX_MOVES = [None] * 128
+for piece in WHITE_PIECES | BLACK_PIECES:
+    side = PIECE_SIDES[piece]
+    kind = chr(piece).upper()
+    if kind == 'P':
+        MAILBOX_MOVES[piece] = (mailbox_steps(PAWN_PUSH_OFFSETS[side]),
+                                mailbox_steps(PAWN_CAPTURE_OFFSETS[side]), (), (), 1)
+    elif kind == 'N':
+        MAILBOX_MOVES[piece] = ((), (), MAILBOX_KNIGHT_STEPS, (), 3)
+    elif kind == 'K':
+        MAILBOX_MOVES[piece] = ((), (), MAILBOX_KING_STEPS, (), 1)
+    else:
+        MAILBOX_MOVES[piece] = ((), (), (), mailbox_steps(SLIDER_DIRECTIONS[kind]), 0)
+
+class MailboxPosition(Position):
+    def __init__(self, board, player="WHITE"):
+        super().__init__(board, player)
+        self.mailbox = bytearray([OFF_BOARD]) * 120
+        for index, piece in enumerate(self.squares):
+            self.mailbox[MAILBOX_INDEX[index]] = piece
+
+    def make_move(self, move):
+        mailbox = self.mailbox
+        mailbox[MAILBOX_INDEX[move & SQUARE_MASK]] = move >> PIECE_SHIFT & PIECE_MASK
+        mailbox[MAILBOX_INDEX[move >> FROM_SHIFT & SQUARE_MASK]] = EMPTY
+        super().make_move(move)
+
+    def unmake_move(self):
+        move, moved, key = self.undo_stack[-1]
+        mailbox = self.mailbox
+        mailbox[MAILBOX_INDEX[move >> FROM_SHIFT & SQUARE_MASK]] = moved
+        mailbox[MAILBOX_INDEX[move & SQUARE_MASK]] = move >> CAPTURED_SHIFT & PIECE_MASK
+        super().unmake_move()
+
+    def is_attacked(self, index, by_player):
+        pawn, knight, bishop, rook, queen, king = ATTACKING_PIECES[by_player]
+        mailbox = self.mailbox
+        origin = MAILBOX_INDEX[index]
+        for step in MAILBOX_PAWN_ATTACKER_STEPS[by_player]:
+            if mailbox[origin + step] == pawn:
+                return True
+        for step in MAILBOX_KNIGHT_STEPS:
+            if mailbox[origin + step] == knight:
+                return True
+        for step in MAILBOX_KING_STEPS:
+            if mailbox[origin + step] == king:
+                return True
+        for step in MAILBOX_ROOK_STEPS:
+            square = origin + step
+            while mailbox[square] == EMPTY:
+                square += step
+            if mailbox[square] == rook or mailbox[square] == queen:
+                return True
+        for step in MAILBOX_BISHOP_STEPS:
+            square = origin + step
+            while mailbox[square] == EMPTY:
+                square += step
+            if mailbox[square] == bishop or mailbox[square] == queen:
+                return True
+        return False
+
+    def generate_moves(self, player):
+        return generate_moves_mailbox(self, player)
+
+    def generate_captures(self, player):
+        return generate_moves_mailbox(self, player, True)
+
+    def generate_quiets(self, player):
+        return generate_moves_mailbox(self, player, quiets_only=True)
+
+    def piece_moves(self, index, player, captures):
+        moves = []
+        add_mailbox_moves(moves, self.mailbox, index, ENEMY_PIECES[player], captures, not captures)
+        return moves
+
+# Appends the captures (if captures) and quiet moves (if quiets) of the piece
+# on board square index to list. OFF_BOARD is neither EMPTY nor an enemy, so
+# a step onto the border is treated like one onto a piece of the mover's own
+def add_mailbox_moves(list, mailbox, index, enemies, captures=True, quiets=True):
+    origin = MAILBOX_INDEX[index]
+    piece = mailbox[origin]
+    pushes, pawn_captures, jumps, slides, distance = MAILBOX_MOVES[piece]
+    move_bits = index << FROM_SHIFT | piece << PIECE_SHIFT | distance << DISTANCE_SHIFT
+    if quiets:
+        for step in pushes:
+            if mailbox[origin + step] == EMPTY:
+                list.append(move_bits | MAILBOX_SQUARES[origin + step] | QUIET_BITS)
+    if captures:
+        for step in pawn_captures:
+            target = mailbox[origin + step]
+            if target in enemies:
+                list.append(move_bits | MAILBOX_SQUARES[origin + step] |
+                            target << CAPTURED_SHIFT)
+    for step in jumps:
+        target = mailbox[origin + step]
+        if target == EMPTY:
+            if quiets:
+                list.append(move_bits | MAILBOX_SQUARES[origin + step] | QUIET_BITS)
+        elif captures and target in enemies:
+            list.append(move_bits | MAILBOX_SQUARES[origin + step] | target << CAPTURED_SHIFT)
+    for step in slides:
+        square = origin + step
+        distance = 1
+        target = mailbox[square]
+        while target == EMPTY:
+            if quiets:
+                list.append(move_bits | MAILBOX_SQUARES[square] | QUIET_BITS |
+                            distance << DISTANCE_SHIFT)
+            square += step
+            distance += 1
+            target = mailbox[square]
+        if captures and target in enemies:
+            list.append(move_bits | MAILBOX_SQUARES[square] | target << CAPTURED_SHIFT |
+                        distance << DISTANCE_SHIFT)
+
+def generate_moves_mailbox(position, player, captures_only=False, quiets_only=False):
+    mailbox = position.mailbox
+    enemies = ENEMY_PIECES[player]
+    captures, quiets = not quiets_only, not captures_only
+    moves = []
+
+    pieces = position.pieces[player]
+    while pieces:
+        bit = pieces & -pieces
+        pieces ^= bit
+        add_mailbox_moves(moves, mailbox, bit.bit_length() - 1, enemies, captures, quiets)
+
+    return moves
+
+# Move generators selectable with --movegen
+MOVE_GENERATORS = {
+    "table": Position,
+    "unrolled": UnrolledPosition,
+    "bitboard": BitboardPosition,
+    "mailbox": MailboxPosition
+}
+
+################################################################################
+#  Lazy move generation
+# ------------------------------------------------------------------------------
+#  iterate_moves yields the moves of one piece at a time, first every
+#  piece's captures and then every piece's quiet moves, so a consumer that
+#  stops early (a beta cutoff, or has_legal_move finding a legal move)
+#  never pays for generating the rest. The position may be changed between
+#  moves as long as it is restored before the next one is taken. With
+#  --lazy-movegen the search takes its moves this way after the hash move,
+#  instead of from a sorted list, each piece's moves sorted by the search
+#  heuristic's key: distance moved, value of piece taken, or for heuristic 3
+#  MVV-LVA for captures and the history score for quiet moves (killers are
+#  not tried first, as finding them would mean generating every quiet move).
+use_lazy_movegen = False
+
+def iterate_moves(position, player, counted=False, key=None):
+    for captures in (True, False):
+        for index in square_indices(position.pieces[player]):
+            moves = position.piece_moves(index, player, captures)
+            if counted:
+                search_stats["moves_generated"] += len(moves)
+            if key is not None:
+                moves.sort(key = key, reverse = True)
+            for move in moves:
+                yield move
+
+def staged_order_key(move):
+    if move >> CAPTURED_SHIFT & PIECE_MASK != EMPTY:
+        return mvv_lva(move)
+    return history_score(move) if use_killers_history else 0
+
+def lazy_moves(position, player, hash_move, search):
+    if hash_move is not None and move_fits(position.squares, hash_move):
+        yield hash_move
+    else:
+        hash_move = None
+    key = sortFirst if search == 1 else sortSecond if search == 2 else staged_order_key
+    for move in iterate_moves(position, player, count_moves, key):
+        if not is_same_move(move, hash_move):
+            yield move
+
+def has_legal_move(position, player):
+    for move in iterate_moves(position, player):
+        position.make_move(move)
+        legal = not in_check(position, player)
+        position.unmake_move()
+        if legal:
+            return True
+    return False
+
+################################################################################
+#  Transposition table
+# ------------------------------------------------------------------------------
+#  Results of earlier searches keyed by Zobrist key. Each bucket has two
+#  slots: a depth-preferred slot that is only overwritten by a search at
+#  least as deep, and an always-replace slot that takes everything else.
+#  Entries are (key, depth searched below the node, score, bound, best move),
+#  the move packed into an int.
+EXACT = 0
+LOWER_BOUND = 1    # score is at least this (search failed high)
+UPPER_BOUND = 2    # score is at most this (search failed low)
+
+# Checkmates score MATE_VALUE - depth; scores this large are treated as
+# mates. A static evaluation stays far below MATE_THRESHOLD: at most 103
+# pawns of material (nine queens and the other pieces) plus piece-square
+# bonuses of a pawn or so per piece.
+MATE_VALUE = 1000
+MAX_PLY = 40
+MATE_THRESHOLD = MATE_VALUE - MAX_PLY
+
+# A mate score depends on the depth of the node it is seen from, so it is
+# stored as if the node were at depth 1 and converted back on lookup
+def score_to_tt(score, depth):
+    if MATE_THRESHOLD <= abs(score) < float("inf"):
+        return score + depth - 1 if score > 0 else score - depth + 1
+    return score
+
+def score_from_tt(score, depth):
+    if MATE_THRESHOLD <= abs(score) < float("inf"):
+        return score - depth + 1 if score > 0 else score + depth - 1
+    return score
+
+class TranspositionTable:
+    # Rough size of one stored entry: the tuple, its key and score objects
+    # and the bucket's list slot
+    ENTRY_BYTES = 160
+
+    def __init__(self, size_mb):
+        self.num_buckets = max(1, int(size_mb * 1024 * 1024) // (2 * self.ENTRY_BYTES))
+        self.depth_preferred = [None] * self.num_buckets
+        self.always_replace = [None] * self.num_buckets
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0    # misses where the bucket held another position
+
+    def probe(self, key):
+        index = key % self.num_buckets
+        entry = self.depth_preferred[index]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        other = self.always_replace[index]
+        if other is not None and other[0] == key:
+            self.hits += 1
+            return other
+        self.misses += 1
+        if entry is not None or other is not None:
+            self.collisions += 1
+        return None
+
+    def store(self, key, depth, score, bound, move):
+        index = key % self.num_buckets
+        entry = (key, depth, score, bound, move)
+        current = self.depth_preferred[index]
+        if current is None or current[0] == key or depth >= current[1]:
+            self.depth_preferred[index] = entry
+        else:
+            self.always_replace[index] = entry
+
+    def report(self):
+        probes = self.hits + self.misses
+        return ("TT: %d buckets, %d probes, %.1f%% hits, %.1f%% misses, %.1f%% collisions" %
+                (self.num_buckets, probes, 100.0 * self.hits / max(probes, 1),
+                 100.0 * self.misses / max(probes, 1), 100.0 * self.collisions / max(probes, 1)))
+
+# Transposition table used by the search; None disables it (--tt-size 0)
+transposition_table = None
+
+# Looks position up in the transposition table. Returns a score if the stored
+# result is deep enough to settle this node for the (alpha, beta) window, or
+# None, together with the stored best move for move ordering
+def probe_tt(position, alpha, beta, depth):
+    entry = transposition_table.probe(position.key)
+    if entry is None:
+        return None, None
+    key, searched, score, bound, move = entry
+    if searched >= search_max_depth - depth:
+        score = score_from_tt(score, depth)
+        if (bound == EXACT or (bound == LOWER_BOUND and score >= beta) or
+                (bound == UPPER_BOUND and score <= alpha)):
+            return score, move
+    return None, move
+
+def store_tt(position, alpha, beta, depth, value, move):
+    if value <= alpha:
+        bound = UPPER_BOUND
+    elif value >= beta:
+        bound = LOWER_BOUND
+    else:
+        bound = EXACT
+    transposition_table.store(position.key, search_max_depth - depth, score_to_tt(value, depth),
+                              bound, move)
+
+# Moves the stored best move to the front of moves
+def order_hash_move(moves, hash_move):
+    for i, move in enumerate(moves):
+        if move & FROM_TO_MASK == hash_move & FROM_TO_MASK:
+            moves.insert(0, moves.pop(i))
+            break
 
 ################################################################################
 #  Heuristic-Minimax Search
@@ -1533,69 +2567,622 @@ def move_king_black(state, list, x_cord, y_cord):
 # Number of states visited
 num_states_visited = 0
 
-def alpha_beta_search(state, depth, search):
-    value, chosen_state = max_value(state, float("-inf"), float("inf"), depth, search)
-
-    return (chosen_state, value)
-
-def max_value(state, alpha, beta, depth, search):
+# Counters reported by the search enhancements, reset by solve()
+search_stats = collections.Counter()
+
+# Set by --compare-lazy: count the moves generated and searched at each node
+count_moves = False
+
+# Depth at which cutoff_test stops the current search
+search_max_depth = MAX_DEPTH
+
+# Limits for iterative_deepening; the search raises SearchTimeout when either
+# is passed
+search_deadline = float("inf")     # time.perf_counter() value
+search_node_limit = float("inf")   # num_states_visited value
+
+class SearchTimeout(Exception):
+    pass
+
+def check_search_limits():
+    if num_states_visited >= search_node_limit or time.perf_counter() >= search_deadline:
+        raise SearchTimeout()
+
+# Searches the Board state in place on a single Position; returns the chosen
+# child as a (board, distance moved, value of piece taken) tuple
+def alpha_beta_search(state, depth, search, generator="table", max_depth=MAX_DEPTH):
+    global search_max_depth
+    search_max_depth = max_depth
+    position = MOVE_GENERATORS[generator](state)
+    value, chosen_move = negamax(position, float("-inf"), float("inf"), depth, search, 1)
+    return (chosen_root_state(state, chosen_move), value)
+
+# The child of state reached by chosen_move as a (board, distance moved,
+# value of piece taken) tuple, or None if there was no move
+def chosen_root_state(state, chosen_move):
+    if chosen_move is None:
+        return None
+    move = Move(chosen_move)
+    return (state.move(move.from_index, move.to_index, move.piece), move.distance, move.value)
+
+# Side to move for color
+PLAYERS = {1: "WHITE", -1: "BLACK"}
+
+# Negamax form of alpha-beta: color is 1 with White to move and -1 with Black
+# to move, and every score is from the point of view of the side to move, so
+# one function serves both players
+def negamax(position, alpha, beta, depth, search, color, null_move=True):
     global num_states_visited
-    #num_states_visited += 1
-    is_max_depth, is_checkmate = cutoff_test(state, depth, "WHITE")
-    if is_checkmate:
-        return (1000/depth), state
+    check_search_limits()
+    if check_incremental_eval:
+        evaluate_position(position)
+    hash_move = None
+    if transposition_table is not None:
+        tt_value, hash_move = probe_tt(position, alpha, beta, depth)
+        if tt_value is not None:
+            return tt_value, hash_move
+
+    player = PLAYERS[color]
+    is_max_depth, is_checkmate, is_stalemate = cutoff_test(position, depth, player)
     if is_max_depth:
-        return evaluate(state), state
-
+        return terminal_value(position, alpha, beta, depth, color, is_checkmate,
+                              is_stalemate), None
+
+    if use_null_move and null_move and null_move_allowed(position, beta, depth, color):
+        null_value = null_move_search(position, beta, depth, search, color)
+        if null_value is not None:
+            return null_value, None
+
+    futility_value = None
+    if (use_futility or use_razoring) and depth > 1 and abs(alpha) < MATE_THRESHOLD:
+        futility_value, razor_value = frontier_pruning(position, alpha, depth, color)
+        if razor_value is not None:
+            return razor_value, None
+
+    moves = ordered_moves(position, player, search, hash_move, depth)
+    batch_scores = None
+    if use_batch_eval and search_max_depth - depth == 1 and not use_quiescence:
+        moves = list(moves)
+        batch_scores = evaluate_children(position, moves)
+
+    alpha_original = alpha
     value = float("-inf")
-    chosen_state = None
-    #board_states = [child[0] for child in get_children(state, "WHITE")]
-    children = get_children(state, "WHITE")
-    if(search == 1):
-        children.sort(key = sortFirst, reverse = True)
-    else:
-        children.sort(key = sortSecond, reverse = True)
-    for child in children:
+    chosen_move = None
+    legal_moves = 0
+    for move_number, move in enumerate(moves):
+        if count_moves:
+            search_stats["moves_searched"] += 1
+        position.make_move(move)
+        if in_check(position, player):
+            position.unmake_move()
+            continue
+        legal_moves += 1
+        if (futility_value is not None and move >> CAPTURED_SHIFT & PIECE_MASK == EMPTY and
+                not in_check(position, OPPONENTS[player])):
+            position.unmake_move()
+            search_stats["futility_pruned"] += 1
+            value = max(value, futility_value)
+            continue
         num_states_visited += 1
-        min_val, min_state = min_value(child[0], alpha, beta, depth+1, search)
-        value = max(value, min_val)
-        if value == min_val:
-            chosen_state = child
+        child_value = None
+        if batch_scores is not None:
+            child_value = frontier_child_value(position, batch_scores[move_number], depth, color)
+        elif use_lmr:
+            child_value = reduced_child_value(position, move, move_number, alpha, depth, search,
+                                              color, hash_move)
+        if child_value is not None:
+            pass
+        elif use_pvs and chosen_move is not None:
+            child_value = pvs_child_value(position, alpha, beta, depth, search, color)
+        else:
+            child_value, _ = negamax(position, -beta, -alpha, depth+1, search, -color)
+        position.unmake_move()
+        child_value = -child_value
+        # Strictly better only: a move that fails low returns an upper bound,
+        # which can tie value without the move being as good
+        if child_value > value:
+            value = child_value
+            chosen_move = move
 
         if value >= beta:
-            return value, chosen_state
+            if use_killers_history and move >> CAPTURED_SHIFT & PIECE_MASK == EMPTY:
+                record_quiet_cutoff(move, depth)
+            break
         alpha = max(alpha, value)
 
-    return value, chosen_state
+    if legal_moves == 0:
+        is_checkmate = in_check(position, player)
+        return terminal_value(position, alpha, beta, depth, color, is_checkmate,
+                              not is_checkmate), None
+    if transposition_table is not None:
+        store_tt(position, alpha_original, beta, depth, value, chosen_move)
+    return value, chosen_move
+
+################################################################################
+#  Principal variation search
+# ------------------------------------------------------------------------------
+#  With good move ordering the first move searched at a node is usually the
+#  best one. PVS searches it with the full window and then only tries to
+#  prove that each later move is no better, using a zero-width window around
+#  alpha, which cuts off much sooner. A move that fails high on the zero
+#  window is better after all and is searched again with the full window.
+use_pvs = False
+ZERO_WINDOW = 0.001    # scores are material counts, whole centipawns and MATE_VALUE - depth
+
+# Negamax value of the child position (already made) for the opponent
+def pvs_child_value(position, alpha, beta, depth, search, color):
+    search_stats["pvs_zero_window_searches"] += 1
+    child_value, _ = negamax(position, -alpha - ZERO_WINDOW, -alpha, depth+1, search, -color)
+    if alpha < -child_value < beta:
+        search_stats["pvs_researches"] += 1
+        child_value, _ = negamax(position, -beta, -alpha, depth+1, search, -color)
+    return child_value
 
-def min_value(state, alpha, beta, depth, search):
+################################################################################
+#  Null-move pruning
+# ------------------------------------------------------------------------------
+#  If the side to move could pass and a search reduced by
+#  NULL_MOVE_REDUCTION plies still fails high, the position is almost
+#  certainly good enough to cut off without searching any real move. Passing
+#  is not tried in check, at the root, twice in a row, or when the side to
+#  move has only its king and pawns, where zugzwang (every move making things
+#  worse) is common and passing would overrate the position. With
+#  verification a null-move cutoff is only taken once a normal search,
+#  reduced by just NULL_VERIFICATION_REDUCTION ply, also fails high; this
+#  catches threats, such as a mate, too deep for the reduced null search.
+use_null_move = False
+use_null_verification = True
+NULL_MOVE_REDUCTION = 2
+NULL_VERIFICATION_REDUCTION = 1
+# Plies left to search below the node. Passing reduces the search by
+# NULL_MOVE_REDUCTION + 1 plies, so with fewer left the null search is too
+# shallow to see the puzzles' mates and prunes the mating lines. This also
+# means null moves are never tried at the default MAX_DEPTH, whose nodes
+# below the root have at most 2 plies left; they need --depth 5 or more
+NULL_MOVE_MIN_DEPTH = 3
+
+NON_PAWN_PIECES = {"WHITE": (b'Q', b'R', b'B', b'N'), "BLACK": (b'q', b'r', b'b', b'n')}
+
+def null_move_allowed(position, beta, depth, color):
+    player = PLAYERS[color]
+    return (depth > 1 and search_max_depth - depth >= NULL_MOVE_MIN_DEPTH and
+            beta < MATE_THRESHOLD and color * evaluate_position(position) >= beta and
+            any(piece in position.squares for piece in NON_PAWN_PIECES[player]) and
+            not in_check(position, player))
+
+# Value of the node if passing proves it fails high, or None
+def null_move_search(position, beta, depth, search, color):
     global num_states_visited
-    #num_states_visited += 1
-    is_max_depth, is_checkmate = cutoff_test(state, depth, "BLACK")
-    if is_checkmate:
-        return (1000/depth), state
-    if is_max_depth:
-        return evaluate(state), state
+    num_states_visited += 1
+    search_stats["null_move_searches"] += 1
+    position.make_null_move()
+    value, _ = negamax(position, -beta, -beta + ZERO_WINDOW, depth + 1 + NULL_MOVE_REDUCTION,
+                       search, -color, False)
+    position.unmake_null_move()
+    value = -value
+    if value < beta:
+        return None
+    value = min(value, MATE_THRESHOLD - 1)    # a mate found by passing is not a real one
+    if use_null_verification:
+        search_stats["null_move_verifications"] += 1
+        value, _ = negamax(position, beta - ZERO_WINDOW, beta, depth + NULL_VERIFICATION_REDUCTION,
+                           search, color, False)
+        if value < beta:
+            search_stats["null_move_verification_failures"] += 1
+            return None
+    search_stats["null_move_cutoffs"] += 1
+    return value
+
+################################################################################
+#  Late move reductions
+# ------------------------------------------------------------------------------
+#  Moves late in a well-ordered list rarely beat alpha, so quiet moves after
+#  the first LMR_FULL_DEPTH_MOVES are searched with a zero window and fewer
+#  plies, taken from lmr_reductions[plies left][move number]. Captures, the
+#  hash move, killers and moves that give check are never reduced, and
+#  neither is anything at the root or with fewer than LMR_MIN_DEPTH plies
+#  left, where a reduction cuts off the short mates the puzzles are about. A
+#  reduced move that beats alpha anyway is searched again at full depth.
+use_lmr = False
+LMR_FULL_DEPTH_MOVES = 3
+# Plies left to search below the node. Like null moves, reductions are
+# never tried at the default MAX_DEPTH, whose nodes below the root have at
+# most 2 plies left; they need --depth 4 or more
+LMR_MIN_DEPTH = 3
+LMR_MAX_MOVES = 63
+
+# Reduction grows with the log of both the plies left and the move number
+def build_lmr_table(base, divisor):
+    return [[0] + [int(base + math.log(remaining) * math.log(move_number) / divisor)
+                   if remaining else 0 for move_number in range(1, LMR_MAX_MOVES + 1)]
+            for remaining in range(MAX_PLY + 1)]
+
+lmr_reductions = build_lmr_table(0.75, 2.25)
+
+# Negamax value of the child position (already made) for the opponent from a
+# reduced search, or None if move has to be searched at full depth
+def reduced_child_value(position, move, move_number, alpha, depth, search, color, hash_move):
+    remaining = search_max_depth - depth
+    if (depth == 1 or move_number < LMR_FULL_DEPTH_MOVES or remaining < LMR_MIN_DEPTH or
+            move >> CAPTURED_SHIFT & PIECE_MASK != EMPTY or is_same_move(move, hash_move) or
+            any(is_same_move(move, killer) for killer in killer_moves[depth])):
+        return None
+    reduction = min(lmr_reductions[min(remaining, MAX_PLY)][min(move_number, LMR_MAX_MOVES)],
+                    remaining - 1)
+    if reduction <= 0 or in_check(position, PLAYERS[-color]):
+        return None
+    search_stats["lmr_reductions"] += 1
+    child_value, _ = negamax(position, -alpha - ZERO_WINDOW, -alpha, depth + 1 + reduction,
+                             search, -color)
+    if -child_value > alpha:
+        search_stats["lmr_researches"] += 1
+        return None
+    return child_value
 
-    value = float("inf")
-    chosen_state = None
-    children = get_children(state, "BLACK")
+################################################################################
+#  Futility pruning and razoring
+# ------------------------------------------------------------------------------
+#  One ply above the depth limit (the frontier), a quiet move cannot change
+#  the material count, so if the static evaluation plus futility_margin is
+#  still no better than alpha, quiet moves that do not give check are
+#  skipped. Two plies above it, if the static evaluation plus razor_margin
+#  is no better than alpha, a quiescence search decides: if captures cannot
+#  lift the score above alpha either, the node fails low without a search.
+#  Neither is done at the root or in check.
+use_futility = False
+use_razoring = False
+futility_margin = 3    # a minor piece
+razor_margin = 5       # a rook
+
+# Returns (futility value, razor value): the score to give pruned quiet moves
+# if the node is at the frontier and futile, and the node's value if razoring
+# settles it; either is None otherwise
+def frontier_pruning(position, alpha, depth, color):
+    remaining = search_max_depth - depth
+    static_value = color * evaluate_position(position)
+    if remaining == 1 and use_futility and static_value + futility_margin <= alpha:
+        if not in_check(position, PLAYERS[color]):
+            return static_value + futility_margin, None
+    elif remaining == 2 and use_razoring and static_value + razor_margin <= alpha:
+        if not in_check(position, PLAYERS[color]):
+            value = quiescence(position, alpha, alpha + ZERO_WINDOW, color)
+            if value <= alpha:
+                search_stats["razored"] += 1
+                return None, value
+    return None, None
+
+# Moves for player in the order given by the search heuristic (1: distance
+# moved, 2: value of piece taken, 3: staged) with the transposition table's
+# best move first
+def ordered_moves(position, player, search, hash_move, depth):
+    if use_lazy_movegen:
+        return lazy_moves(position, player, hash_move, search)
+    if search == 3:
+        return staged_moves(position, player, hash_move, depth)
+    moves = position.generate_moves(player)
+    if count_moves:
+        search_stats["moves_generated"] += len(moves)
     if(search == 1):
-        children.sort(key = sortFirst, reverse = True)
+        moves.sort(key = sortFirst, reverse = True)
+    else:
+        moves.sort(key = sortSecond, reverse = True)
+    if hash_move is not None:
+        order_hash_move(moves, hash_move)
+    return moves
+
+################################################################################
+#  Staged move ordering (search heuristic 3)
+# ------------------------------------------------------------------------------
+#  Moves are produced in stages: the transposition table's best move, then
+#  captures by most valuable victim / least valuable attacker, then the
+#  killer moves for the depth, then the other quiet moves by history score.
+#  Each stage is only generated once the previous one is exhausted (the
+#  killers are picked out of the generated quiet moves), so a beta cutoff
+#  early on never pays for generating or sorting the rest.
+
+# Attacker order for MVV-LVA, indexed by piece byte
+attacker_ranks = [0] * 128
+for rank, pieces in enumerate(('Pp', 'Nn', 'Bb', 'Rr', 'Qq', 'Kk')):
+    for piece in pieces:
+        attacker_ranks[ord(piece)] = rank
+
+def mvv_lva(move):
+    return (byte_values[move >> CAPTURED_SHIFT & PIECE_MASK] * 8 -
+            attacker_ranks[move >> PIECE_SHIFT & PIECE_MASK])
+
+def is_same_move(move, other):
+    return other is not None and move & FROM_TO_MASK == other & FROM_TO_MASK
+
+# A move from another position (the hash move) can be played here if its
+# piece is still on from_index and to_index still holds what it captured
+def move_fits(squares, move):
+    return (squares[move >> FROM_SHIFT & SQUARE_MASK] == move >> PIECE_SHIFT & PIECE_MASK and
+            squares[move & SQUARE_MASK] == move >> CAPTURED_SHIFT & PIECE_MASK)
+
+################################################################################
+#  Killer moves and history heuristic
+# ------------------------------------------------------------------------------
+#  Quiet moves that caused a beta cutoff: the last two at each depth (killer
+#  moves, likely to refute sibling positions too) and a score per from/to
+#  square pair that grows with the depth of the cutoff (history). Both order
+#  the quiet stage of staged_moves and are cleared for each new puzzle.
+use_killers_history = True
+KILLER_SLOTS = 2
+
+killer_moves = [[] for depth in range(MAX_PLY + 2)]
+history_table = [0] * (64 * 64)    # indexed by move & FROM_TO_MASK
+
+def clear_move_ordering_tables():
+    for killers in killer_moves:
+        del killers[:]
+    history_table[:] = [0] * (64 * 64)
+
+def record_quiet_cutoff(move, depth):
+    killers = killer_moves[depth]
+    if not any(is_same_move(move, killer) for killer in killers):
+        killers.insert(0, move)
+        del killers[KILLER_SLOTS:]
+    remaining = max(search_max_depth - depth, 1)
+    history_table[move & FROM_TO_MASK] += remaining * remaining
+
+def history_score(move):
+    return history_table[move & FROM_TO_MASK]
+
+def staged_moves(position, player, hash_move, depth):
+    squares = position.squares
+    # The stored move came from a position with the same key; check it still
+    # fits the board in case of a key collision
+    if hash_move is not None and move_fits(squares, hash_move):
+        if count_moves:
+            search_stats["moves_generated"] += 1
+        yield hash_move
     else:
-        children.sort(key = sortSecond, reverse = True)
-    for child in children:
+        hash_move = None
+
+    captures = [move for move in position.generate_captures(player)
+                if not is_same_move(move, hash_move)]
+    if count_moves:
+        search_stats["moves_generated"] += len(captures)
+    captures.sort(key = mvv_lva, reverse = True)
+    for move in captures:
+        yield move
+
+    if not use_killers_history:
+        quiets = [move for move in position.generate_quiets(player)
+                  if not is_same_move(move, hash_move)]
+        if count_moves:
+            search_stats["moves_generated"] += len(quiets)
+        for move in quiets:
+            yield move
+        return
+
+    # Killers are quiet moves from sibling positions, where a slider's path
+    # may have been clear; only play those that are quiet moves here too
+    quiets = [move for move in position.generate_quiets(player)
+              if not is_same_move(move, hash_move)]
+    if count_moves:
+        search_stats["moves_generated"] += len(quiets)
+    killers = [move for killer in killer_moves[depth]
+               for move in quiets if is_same_move(move, killer)]
+    for move in killers:
+        yield move
+
+    quiets = [move for move in quiets
+              if not any(is_same_move(move, killer) for killer in killers)]
+    quiets.sort(key = history_score, reverse = True)
+    for move in quiets:
+        yield move
+
+################################################################################
+#  Batched frontier search
+# ------------------------------------------------------------------------------
+#  One ply above the depth limit every child is a leaf, so with --batch-eval
+#  all of them are scored with a single evaluate_batch() call instead of one
+#  search call each. negamax's own move loop still tests the children for
+#  legality, futility, checkmate and stalemate one by one, in move order, and
+#  stops at a beta cutoff as usual, but the batch has already evaluated the
+#  children that were not reached. Children are scored statically rather
+#  than looked up in the transposition table.
+#  This does not pay off: the search otherwise reads each child's score from
+#  the incrementally updated evaluation, an O(1) lookup once the child is
+#  made, and the children still have to be made one at a time for the
+#  legality and mate tests. Searching the three puzzles to 5 plies with every
+#  heuristic takes about 5% longer with --batch-eval, 10% with --pst tapered.
+#  evaluate_batch() only beats evaluate(), the full board scan (see
+#  --benchmark-eval).
+use_batch_eval = False
+
+# evaluate() of the board after each of moves, in one batch
+def evaluate_children(position, moves):
+    search_stats["batch_evaluations"] += 1
+    search_stats["batch_evaluated_children"] += len(moves)
+    if not moves:
+        return []
+    return evaluate_batch(child_boards(position.squares, moves)).tolist()
+
+# Negamax value of the leaf child position (already made) for the opponent,
+# given its batch score
+def frontier_child_value(position, score, depth, color):
+    opponent = PLAYERS[-color]
+    if has_legal_move(position, opponent):
+        return -color * score
+    if in_check(position, opponent):
+        return -(MATE_VALUE - (depth + 1))
+    return 0
+
+# Value of a checkmate, stalemate or max-depth node for the side to move
+# (checkmate means the side to move has been mated; stalemate is a draw).
+# Mates, stalemates and static evaluations are stored in the transposition
+# table as exact, mates and stalemates regardless of the depth they are
+# probed at; quiescence results are bounds on the (alpha, beta) window
+def terminal_value(position, alpha, beta, depth, color, is_checkmate=False, is_stalemate=False):
+    if is_checkmate:
+        value = -(MATE_VALUE - depth)
+    elif is_stalemate:
+        value = 0
+    elif use_quiescence:
+        value = quiescence(position, alpha, beta, color)
+        if transposition_table is not None:
+            store_tt(position, alpha, beta, depth, value, None)
+        return value
+    else:
+        value = color * evaluate_position(position)
+    if transposition_table is not None:
+        transposition_table.store(position.key, MAX_PLY if is_checkmate or is_stalemate else 0,
+                                  score_to_tt(value, depth), EXACT, None)
+    return value
+
+################################################################################
+#  Quiescence search
+# ------------------------------------------------------------------------------
+#  Past the depth limit only captures are searched, so leaves are not scored
+#  in the middle of an exchange. The side to move may stand pat on the static
+#  evaluation instead of capturing, and captures that could not lift the
+#  score to alpha even with DELTA_MARGIN to spare are skipped (delta pruning).
+use_quiescence = False
+DELTA_MARGIN = 2
+
+def quiescence(position, alpha, beta, color):
+    global num_states_visited
+    check_search_limits()
+    if check_incremental_eval:
+        evaluate_position(position)
+    value = color * evaluate_position(position)    # stand pat
+    if value >= beta:
+        return value
+    alpha = max(alpha, value)
+
+    captures = position.generate_captures(PLAYERS[color])
+    captures.sort(key = sortSecond, reverse = True)    # most valuable victim first
+    for i, move in enumerate(captures):
+        if value + byte_values[move >> CAPTURED_SHIFT & PIECE_MASK] + DELTA_MARGIN <= alpha:
+            search_stats["delta_pruned"] += len(captures) - i    # the rest are smaller
+            break
+        position.make_move(move)
+        if in_check(position, PLAYERS[color]):
+            position.unmake_move()
+            continue
         num_states_visited += 1
-        max_val, max_state = max_value(child[0], alpha, beta, depth+1, search)
-        value = min(value, max_val)
-        if value == max_val:
-            chosen_state = child
+        search_stats["quiescence_states"] += 1
+        child_value = -quiescence(position, -beta, -alpha, -color)
+        position.unmake_move()
+        value = max(value, child_value)
+        if value >= beta:
+            break
+        alpha = max(alpha, value)
+
+    return value
+
+################################################################################
+#  Iterative deepening
+# ------------------------------------------------------------------------------
+#  Searches 1, 2, 3, ... plies until time_limit seconds have passed or
+#  node_limit states have been visited, and returns the result of the last
+#  iteration that completed together with its depth in plies. The one-ply
+#  search always runs to completion so there is always a move to return.
+#  Each iteration leaves its best moves in the transposition table (if one
+#  is enabled), which orders the next, deeper iteration. With MTD(f) or
+#  aspiration windows each iteration's value is the guess for the next one.
+def iterative_deepening(state, search, generator="table", time_limit=None, node_limit=None,
+                        max_plies=MAX_PLY - 1):
+    global search_deadline, search_node_limit
+    start_time = time.perf_counter()
+    choice, plies = None, 0
+    guess = evaluate(state)
+    try:
+        for depth_limit in range(1, max_plies + 1):
+            try:
+                choice = search_iteration(state, search, guess, generator, depth_limit + 1)
+            except SearchTimeout:
+                break
+            guess = choice[1]
+            plies = depth_limit
+            if abs(choice[1]) >= MATE_THRESHOLD:
+                break    # a shallower iteration would have found a shorter mate
+            if time_limit is not None:
+                search_deadline = start_time + time_limit
+            if node_limit is not None:
+                search_node_limit = node_limit
+    finally:
+        search_deadline = float("inf")
+        search_node_limit = float("inf")
+    return choice, plies
 
+################################################################################
+#  MTD(f)
+# ------------------------------------------------------------------------------
+#  Finds the minimax value with a sequence of zero-window alpha-beta searches
+#  from first_guess: each one says whether the value is above or below a
+#  test score, narrowing [lower, upper] until they meet. Nodes re-searched
+#  by later passes come out of the transposition table, so it needs one
+#  (solve() creates MTDF_TT_SIZE megabytes if --tt-size is not given).
+#  Returns (chosen_state, value) like alpha_beta_search.
+use_mtdf = False
+MTDF_TT_SIZE = 16
+
+def mtdf(state, search, first_guess, generator="table", max_depth=MAX_DEPTH):
+    global search_max_depth
+    search_max_depth = max_depth
+    position = MOVE_GENERATORS[generator](state)
+    value = first_guess
+    lower, upper = float("-inf"), float("inf")
+    chosen_move = None
+    while lower < upper:
+        beta = max(value, lower + ZERO_WINDOW)
+        search_stats["mtdf_passes"] += 1
+        value, move = negamax(position, beta - ZERO_WINDOW, beta, 1, search, 1)
+        if value < beta:
+            upper = value
+            chosen_move = chosen_move or move
+        else:
+            lower = value
+            chosen_move = move    # a fail high proves this move reaches value
+    return (chosen_root_state(state, chosen_move), value)
+
+################################################################################
+#  Aspiration windows
+# ------------------------------------------------------------------------------
+#  While deepening, the value rarely moves far from the previous iteration's,
+#  so the root is searched with a window of aspiration_window either side of
+#  it, which cuts off more than an infinite one. If the value falls outside
+#  the window, the search is repeated with the window grown ASPIRATION_GROWTH
+#  times on that side, and with an infinite one once it passes
+#  ASPIRATION_MAX_WINDOW or the guess is a mate score.
+use_aspiration = False
+aspiration_window = 1    # a pawn
+ASPIRATION_GROWTH = 4
+ASPIRATION_MAX_WINDOW = 64
+
+def aspiration_search(state, search, guess, generator="table", max_depth=MAX_DEPTH):
+    global search_max_depth
+    search_max_depth = max_depth
+    position = MOVE_GENERATORS[generator](state)
+    below = above = aspiration_window
+    while True:
+        alpha, beta = guess - below, guess + above
+        if below > ASPIRATION_MAX_WINDOW or abs(guess) >= MATE_THRESHOLD:
+            alpha = float("-inf")
+        if above > ASPIRATION_MAX_WINDOW or abs(guess) >= MATE_THRESHOLD:
+            beta = float("inf")
+        search_stats["aspiration_searches"] += 1
+        value, chosen_move = negamax(position, alpha, beta, 1, search, 1)
         if value <= alpha:
-            return value, chosen_state
-        beta = min(beta, value)
+            search_stats["aspiration_fail_lows"] += 1
+            below *= ASPIRATION_GROWTH
+        elif value >= beta:
+            search_stats["aspiration_fail_highs"] += 1
+            above *= ASPIRATION_GROWTH
+        else:
+            return (chosen_root_state(state, chosen_move), value)
 
-    return value, chosen_state
+# Searches state to max_depth with the root search selected by --algorithm
+# and --aspiration; guess is the value found one ply shallower
+def search_iteration(state, search, guess, generator="table", max_depth=MAX_DEPTH):
+    if use_mtdf:
+        return mtdf(state, search, guess, generator, max_depth)
+    if use_aspiration:
+        return aspiration_search(state, search, guess, generator, max_depth)
+    return alpha_beta_search(state, 1, search, generator, max_depth)
 
 # Testing getChildren
 # list = get_children(initial_state_A, 'WHITE')
@@ -1607,12 +3194,258 @@ def min_value(state, alpha, beta, depth, search):
 #     state_counter = state_counter + 1
 # print("Branching factor: ", state_counter)
 
-choice = alpha_beta_search(initial_states[used_state], 1, used_search)
-print(np.matrix(choice[0][0]))
-print("Distance moved: ", choice[0][1])
-print("Value of piece taken: ", choice[0][2])
-print("End value: ", choice[1])
-print("Number of states visited: ", num_states_visited)
+# Every position two plies from the built-in puzzles, repeated to count boards
+def sample_boards(count):
+    boards = []
+    for rows in initial_states.values():
+        position = Position(Board.from_rows(rows))
+        for move in position.generate_moves("WHITE"):
+            position.make_move(move)
+            for reply in position.generate_moves("BLACK"):
+                position.make_move(reply)
+                boards.append(position.board())
+                position.unmake_move()
+            position.unmake_move()
+    return [boards[i % len(boards)] for i in range(count)]
+
+# Time per board of evaluate() in a loop and of evaluate_batch() (including
+# packing the boards into an array) for growing batch sizes
+def benchmark_batch_evaluation(max_batch=4096, boards_per_size=16384):
+    crossover = None
+    batch = 1
+    while batch <= max_batch:
+        boards = sample_boards(batch)
+        repeats = max(1, boards_per_size // batch)
+        start_time = time.perf_counter()
+        for repeat in range(repeats):
+            scores = [evaluate(board) for board in boards]
+        loop_time = (time.perf_counter() - start_time) / (repeats * batch)
+        start_time = time.perf_counter()
+        for repeat in range(repeats):
+            packed = np.frombuffer(b"".join(board.squares for board in boards), dtype=np.int8)
+            batch_scores = evaluate_batch(packed.reshape(batch, 64))
+        batch_time = (time.perf_counter() - start_time) / (repeats * batch)
+        if batch_scores.tolist() != scores:
+            raise EvaluationMismatch("evaluate_batch() differs from evaluate()")
+        print("%5d boards: %7.2f us/board evaluate(), %7.2f us/board evaluate_batch()" %
+              (batch, loop_time * 1e6, batch_time * 1e6))
+        if crossover is None and batch_time < loop_time:
+            crossover = batch
+        batch *= 2
+    if crossover is None:
+        print("evaluate_batch() was not faster at any batch size")
+    else:
+        print("evaluate_batch() is faster from %d boards per call" % crossover)
+
+class MoveGenerationMismatch(Exception):
+    pass
+
+# Every position reached by legal moves within plies plies of position, as
+# (board, side to move) keys of found
+def collect_positions(position, player, plies, found):
+    found[position.board(), player] = True
+    if plies == 0:
+        return
+    for move in position.generate_moves(player):
+        position.make_move(move)
+        if not in_check(position, player):
+            collect_positions(position, OPPONENTS[player], plies - 1, found)
+        position.unmake_move()
+
+COMPARE_MOVEGEN_PLIES = 3
+
+# Checks that every generator in MOVE_GENERATORS gives the same moves (all
+# of them, captures, quiet moves and one piece at a time) as the move_*
+# functions in every position within plies plies of each puzzle, then times
+# each generating all moves in all of them (best of repeats)
+def compare_move_generators(plies=COMPARE_MOVEGEN_PLIES, repeats=3):
+    init_slider_tables()
+    for state_number in sorted(initial_states):
+        found = {}
+        collect_positions(Position(Board.from_rows(initial_states[state_number])), "WHITE",
+                          plies, found)
+        expected = {}
+        for board, player in found:
+            reference = UnrolledPosition(board)
+            expected[board, player] = [sorted(reference.generate_moves(player)),
+                                       sorted(reference.generate_captures(player)),
+                                       sorted(reference.generate_quiets(player))]
+        times = {}
+        for name, generator in MOVE_GENERATORS.items():
+            positions = []
+            for board, player in found:
+                position = generator(board)
+                moves = [sorted(position.generate_moves(player)),
+                         sorted(position.generate_captures(player)),
+                         sorted(position.generate_quiets(player))]
+                if (moves != expected[board, player] or
+                        sorted(iterate_moves(position, player)) != moves[0]):
+                    raise MoveGenerationMismatch("%s generator differs from the move_* functions "
+                                                 "for %s in %r" % (name, player, board))
+                positions.append((position, player))
+            best = float("inf")
+            for repeat in range(repeats):
+                start_time = time.perf_counter()
+                for position, player in positions:
+                    position.generate_moves(player)
+                best = min(best, time.perf_counter() - start_time)
+            times[name] = best
+        print("Puzzle %d: %d positions within %d plies, same moves from every generator" %
+              (state_number, len(found), plies))
+        print("          " + ", ".join("%s %.3f s (%.2fx)" % (name, elapsed,
+                                                              times["unrolled"] / elapsed)
+                                       for name, elapsed in times.items()))
+
+def format_stats():
+    return ", ".join("%s: %d" % (name.replace("_", " "), count)
+                     for name, count in sorted(search_stats.items()))
+
+# Runs one search on a built-in puzzle, to max_depth unless a time or node
+# limit is given (then deepening to at most max_depth with --depth); returns
+# the search result, the depth searched in plies and the wall time it took
+def solve(state_number, search, algorithm=arguments.algorithm, max_depth=used_depth):
+    global num_states_visited, transposition_table, use_pvs, use_mtdf
+    num_states_visited = 0
+    search_stats.clear()
+    clear_move_ordering_tables()
+    use_pvs = algorithm == "pvs"
+    use_mtdf = algorithm == "mtdf"
+    tt_size = arguments.tt_size
+    if use_mtdf and tt_size <= 0:
+        tt_size = MTDF_TT_SIZE
+    transposition_table = TranspositionTable(tt_size) if tt_size > 0 else None
+    board = Board.from_rows(initial_states[state_number])
+    start_time = time.perf_counter()
+    if arguments.time_limit is not None or arguments.node_limit is not None:
+        max_plies = MAX_PLY - 1 if arguments.depth is None else max_depth - 1
+        choice, plies = iterative_deepening(board, search, arguments.movegen,
+                                            arguments.time_limit, arguments.node_limit,
+                                            max_plies)
+    elif use_mtdf or use_aspiration:
+        # deepen to max_depth, seeding each depth with the previous value
+        choice = (None, evaluate(board))
+        for depth in range(2, max_depth + 1):
+            choice = search_iteration(board, search, choice[1], arguments.movegen, depth)
+        plies = max_depth - 1
+    else:
+        choice = alpha_beta_search(board, 1, search, arguments.movegen, max_depth)
+        plies = max_depth - 1
+    return choice, plies, time.perf_counter() - start_time
+
+use_quiescence = arguments.quiescence
+use_null_move = arguments.null_move != "off"
+use_null_verification = arguments.null_move == "verified"
+use_lmr = arguments.lmr
+use_lazy_movegen = arguments.lazy_movegen
+use_batch_eval = arguments.batch_eval
+use_pst = arguments.pst != "off"
+use_tapered_eval = arguments.pst == "tapered"
+if arguments.pst_file is not None:
+    try:
+        load_piece_square_tables(arguments.pst_file)
+    except (OSError, ValueError) as error:
+        sys.exit("    Error: Could not load piece-square tables from %s: %s" %
+                 (arguments.pst_file, error))
+use_aspiration = arguments.aspiration
+aspiration_window = arguments.aspiration_window
+use_futility = arguments.futility
+futility_margin = arguments.futility_margin
+use_razoring = arguments.razoring
+razor_margin = arguments.razor_margin
+if arguments.lmr_table is not None:
+    lmr_reductions = build_lmr_table(*arguments.lmr_table)
+
+# Build the bitboard slider tables up front so they are not timed
+if arguments.movegen == "bitboard":
+    init_slider_tables()
+
+if arguments.benchmark_eval:
+    print("Piece-square tables: %s" % arguments.pst)
+    benchmark_batch_evaluation()
+elif arguments.check_eval:
+    check_incremental_eval = True
+    print("Move generator: %s, algorithm: %s" % (arguments.movegen, arguments.algorithm))
+    for state_number in sorted(initial_states):
+        for search in (1, 2, 3):
+            choice, plies, elapsed = solve(state_number, search)
+            print("Puzzle %d, search %d: incremental evaluation matches evaluate() at %d nodes" %
+                  (state_number, search, search_stats["eval_checks"]))
+elif arguments.compare_lazy:
+    count_moves = True
+    print("Move generator: %s, search: %d, algorithm: %s" %
+          (arguments.movegen, used_search, arguments.algorithm))
+    for state_number in sorted(initial_states):
+        for use_lazy_movegen in (False, True):
+            choice, plies, elapsed = solve(state_number, used_search)
+            generated = search_stats["moves_generated"]
+            unsearched = generated - search_stats["moves_searched"]
+            print("Puzzle %d %-5s: %6d moves generated, %6d never searched (%5.1f%%), "
+                  "%6d states in %7.3f s, end value %s" %
+                  (state_number, "lazy" if use_lazy_movegen else "full", generated, unsearched,
+                   100.0 * unsearched / max(generated, 1), num_states_visited, elapsed,
+                   choice[1]))
+elif arguments.compare_mtdf:
+    print("Move generator: %s, search: %d" % (arguments.movegen, used_search))
+    for state_number in sorted(initial_states):
+        for algorithm in ("alphabeta", "mtdf"):
+            choice, plies, elapsed = solve(state_number, used_search, algorithm)
+            print("Puzzle %d %-9s: %6d states in %7.3f s, end value %s, %s" %
+                  (state_number, algorithm, num_states_visited, elapsed, choice[1],
+                   format_stats() or "no passes"))
+elif arguments.compare_null_move:
+    print("Move generator: %s, search: %d, algorithm: %s, %d plies" %
+          (arguments.movegen, used_search, arguments.algorithm, used_depth - 1))
+    for state_number in sorted(initial_states):
+        for null_move in ("off", "on", "verified"):
+            use_null_move = null_move != "off"
+            use_null_verification = null_move == "verified"
+            choice, plies, elapsed = solve(state_number, used_search)
+            note = ""
+            if use_null_move and not search_stats["null_move_cutoffs"]:
+                note = ", nothing pruned"
+            print("Puzzle %d %-8s: %6d states in %7.3f s, end value %s%s%s" %
+                  (state_number, null_move, num_states_visited, elapsed, choice[1],
+                   format_stats() and ", " + format_stats(), note))
+elif arguments.compare_movegen:
+    compare_move_generators()
+elif arguments.compare_killers:
+    print("Move generator: %s, search: 3" % arguments.movegen)
+    for state_number in sorted(initial_states):
+        counts = []
+        for use_killers_history in (False, True):
+            choice, plies, elapsed = solve(state_number, 3)
+            counts.append(num_states_visited)
+        change = 100.0 * (counts[0] - counts[1]) / counts[0]
+        print("Puzzle %d: %6d states without killers/history, %6d with, %5.1f%% %s" %
+              (state_number, counts[0], counts[1], abs(change),
+               "fewer" if change >= 0 else "more"))
+elif arguments.benchmark:
+    print("Move generator: %s, search: %d, algorithm: %s" %
+          (arguments.movegen, used_search, arguments.algorithm))
+    for state_number in sorted(initial_states):
+        choice, plies, elapsed = solve(state_number, used_search)
+        print("Puzzle %d: %6d states in %7.3f s, %8.0f states/s, %d plies, end value %s" %
+              (state_number, num_states_visited, elapsed,
+               num_states_visited / elapsed if elapsed else 0, plies, choice[1]))
+        if transposition_table is not None:
+            print("          " + transposition_table.report())
+        if search_stats:
+            print("          " + format_stats())
+else:
+    choice, plies, elapsed = solve(used_state, used_search)
+    print(np.matrix(choice[0][0].to_rows()))
+    print("Distance moved: ", choice[0][1])
+    print("Value of piece taken: ", choice[0][2])
+    print("End value: ", choice[1])
+    print("Number of states visited: ", num_states_visited)
+    if arguments.time_limit is not None or arguments.node_limit is not None:
+        print("Depth reached (plies): ", plies)
+    print("Search time (s): %.3f" % elapsed)
+    print("States per second: %.0f" % (num_states_visited / elapsed if elapsed else 0))
+    if transposition_table is not None:
+        print(transposition_table.report())
+    if search_stats:
+        print(format_stats())
 
 
 